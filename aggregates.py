@@ -0,0 +1,202 @@
+"""Materialised aggregates of an activity store, read by the Visualizar charts.
+
+An AggregateCube is built by buildCube in a single pass over an activity store and holds, on the store's calendar:
+per-week activity sums and the number of players with data, every player's weekly and cumulative XP, and the members'
+cumulative XP of each week in rank order. Charts read these arrays instead of rescanning the whole history. The cube of
+an archive is shared by the sessions working on it: a session's first edit copies only the per-week sums, and update()
+keeps the edited players' rows next to the shared arrays.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+
+import diagnostics
+import isomeriacore
+
+
+class AggregateCube:
+    """Per-week and per-player aggregates of an activity store.
+    weekSums (week x activity) and weekCounts (week) hold the activity sums and the number of players with data for
+    each week. present, weeklyXP and cumulativeXP are (player x week) arrays, and rankedXP holds the members' cumulative
+    XP of each week in ascending order, from which levels and leaderboard places are read.
+    A copy shares these (player x week) arrays with the original: update() keeps the rows of the edited players in
+    edited, so a session's cube only grows with its edits. When edits add weeks, columns maps each week of the cube's
+    calendar to the last week of the shared arrays up to it (-1 if none) and inShared flags the weeks they hold.
+    """
+    def __init__(self, activityStore):
+        self.players = activityStore.players
+        self.playerIndex = activityStore.playerIndex
+        self.memberNames = list(activityStore.members['Nome'])
+        self.memberRows = np.array([self.playerIndex[name] for name in self.memberNames], dtype=np.int64)
+        self.weeks, self.weekDates = activityStore.weeks, activityStore.weekDates
+        self.weekLabels, self.weekIndex = activityStore.weekLabels, activityStore.weekIndex
+        counts, present = activityStore.totalView()
+        counts = counts.reshape(len(self.players), len(self.weeks), len(activityStore.activityIndex))
+        self.present = present.reshape(len(self.players), len(self.weeks)).copy()
+        self.weekSums = counts.sum(axis=0, dtype=np.int64)
+        self.weekCounts = self.present.sum(axis=0)
+        self.weeklyXP = counts @ isomeriacore.referenceTables().activityPoints
+        self.cumulativeXP = self.weeklyXP.cumsum(axis=1)
+        self.rankedXP = np.sort(self.cumulativeXP[self.memberRows], axis=0)
+        self.sharedWeeks = self.weeks
+        self.columns, self.inShared = None, None
+        self.edited = {}
+        self.sharesArrays = False
+
+    @property
+    def nbytes(self):
+        """Memory held by the cube, used by the data cache. The arrays a copy shares with its original are not counted.
+        """
+        size = self.weekSums.nbytes + self.weekCounts.nbytes
+        size += sum(row.nbytes for rows in self.edited.values() for row in rows)
+        if not self.sharesArrays:
+            size += sum(array.nbytes for array in (self.present, self.weeklyXP, self.cumulativeXP, self.rankedXP,
+                                                   self.memberRows))
+        return size
+
+    def sharedRow(self, array, p, carry=False):
+        """Return row p of a shared (player x week) array on the cube's calendar. Weeks added by edits hold zero or,
+        with carry, the value of the week before them (e.g. for cumulative XP).
+        """
+        if self.columns is None:
+            return array[p]
+        keep = self.columns >= 0 if carry else self.inShared
+        row = np.zeros(len(self.weeks), dtype=array.dtype)
+        row[keep] = array[p][self.columns[keep]]
+        return row
+
+    def sharedColumn(self, array, w, carry=False):
+        """Return the column of a shared (row x week) array for the week at position w of the cube's calendar, with
+        the same rules as sharedRow for weeks added by edits.
+        """
+        if self.columns is None:
+            return array[:, w]
+        if self.inShared[w] or (carry and self.columns[w] >= 0):
+            return array[:, self.columns[w]]
+        return np.zeros(len(array), dtype=array.dtype)
+
+    def playerRows(self, p):
+        """Return the presence flags, weekly XP and cumulative XP of player row p on the cube's calendar.
+        """
+        if p in self.edited:
+            return self.edited[p]
+        return (self.sharedRow(self.present, p), self.sharedRow(self.weeklyXP, p),
+                self.sharedRow(self.cumulativeXP, p, carry=True))
+
+    def copy(self):
+        """Return a copy of the cube that can be updated without changing this one.
+        The copy shares the (player x week) arrays and only copies the per-week sums and the edited rows.
+        """
+        cube = copy.copy(self)
+        cube.weekSums, cube.weekCounts = self.weekSums.copy(), self.weekCounts.copy()
+        cube.edited = dict(self.edited)
+        cube.sharesArrays = True
+        return cube
+
+    def extendCalendar(self, activityStore):
+        """Move the cube onto the calendar of activityStore, which holds weeks added by edits.
+        """
+        positions = np.searchsorted(activityStore.weeks, self.weeks)
+        weekSums = np.zeros((len(activityStore.weeks), self.weekSums.shape[1]), dtype=self.weekSums.dtype)
+        weekCounts = np.zeros(len(activityStore.weeks), dtype=self.weekCounts.dtype)
+        weekSums[positions], weekCounts[positions] = self.weekSums, self.weekCounts
+        self.weekSums, self.weekCounts = weekSums, weekCounts
+        self.weeks, self.weekDates = activityStore.weeks, activityStore.weekDates
+        self.weekLabels, self.weekIndex = activityStore.weekLabels, activityStore.weekIndex
+        self.columns = np.searchsorted(self.sharedWeeks, self.weeks, side='right') - 1
+        self.inShared = np.isin(self.weeks, self.sharedWeeks)
+        self.updateRows(activityStore, [self.players[p] for p in self.edited])
+
+    def updateRows(self, activityStore, players):
+        """Recompute the edited rows of the players from activityStore.
+        """
+        for player in players:
+            counts, present = activityStore.playerView(player)
+            weeklyXP = counts @ isomeriacore.referenceTables().activityPoints
+            self.edited[self.playerIndex[player]] = (present.copy(), weeklyXP, weeklyXP.cumsum())
+
+    @diagnostics.timed
+    def update(self, activityStore, players, week):
+        """Update the cube in place after the players' activities for week ('%Y-%m-%d') changed in activityStore.
+        Only that week's sums and the players' rows are recomputed; the shared arrays are never changed. If the week
+        is new to the calendar, the cube moves to the store's calendar first. Return the updated cube.
+        """
+        if week not in self.weekIndex:
+            self.extendCalendar(activityStore)
+        w = self.weekIndex[week]
+        counts, present = activityStore.weekView(week)
+        self.weekSums[w] = counts.sum(axis=0, dtype=np.int64)
+        self.weekCounts[w] = present.sum()
+        self.updateRows(activityStore, players)
+        return self
+
+    def availableWeeks(self):
+        """Return the labels of the weeks with data for any player.
+        """
+        return self.weekLabels[self.weekCounts > 0]
+
+    def activityMean(self, week=None):
+        """Return the mean number of times each activity was executed, for the whole period or for a single week.
+        Only weeks with data are counted; the means are zero if there is no data.
+        """
+        if week is None:
+            sums, count = self.weekSums.sum(axis=0), self.weekCounts.sum()
+        else:
+            sums, count = self.weekSums[self.weekIndex[week]], self.weekCounts[self.weekIndex[week]]
+        return sums / count if count else np.zeros(len(sums))
+
+    def playersWithoutData(self, week):
+        """Return the players that have no data for a week.
+        """
+        w = self.weekIndex[week]
+        present = self.sharedColumn(self.present, w).copy()
+        for p, rows in self.edited.items():
+            present[p] = rows[0][w]
+        return [player for player, hasData in zip(self.players, present) if not hasData]
+
+    def playerXP(self, player):
+        """Return a dataframe with a player's weekly and cumulative XP for the weeks the player has data.
+        """
+        present, weeklyXP, cumulativeXP = self.playerRows(self.playerIndex[player])
+        return pd.DataFrame({'semana': self.weekDates[present], 'XP': weeklyXP[present],
+                             'XP acumulado': cumulativeXP[present]})
+
+    def places(self, memberXP, weeks):
+        """Return the leaderboard places of members with the given (member x week) cumulative XP for the weeks at the
+        calendar positions weeks. A member's place is one plus the number of members with more cumulative XP that week.
+        """
+        ahead = np.empty(memberXP.shape, dtype=np.int64)
+        for i, w in enumerate(weeks):
+            rankedXP = self.sharedColumn(self.rankedXP, w, carry=True)
+            ahead[:, i] = len(rankedXP) - np.searchsorted(rankedXP, memberXP[:, i], side='right')
+        memberRows = set(self.memberRows.tolist())
+        for p, rows in self.edited.items():
+            if p in memberRows:
+                sharedXP = self.sharedRow(self.cumulativeXP, p, carry=True)[weeks]
+                ahead += (rows[2][weeks] > memberXP).astype(np.int64) - (sharedXP > memberXP).astype(np.int64)
+        return ahead + 1
+
+    def leaderboardHistory(self, members):
+        """Return the weekly cumulative XP, level, ranking and leaderboard place of each of the given members,
+        one row per member and week with data for any player.
+        """
+        weeks = np.flatnonzero(self.weekCounts > 0)
+        memberXP = np.array([self.playerRows(self.playerIndex[name])[2][weeks] for name in members],
+                            dtype=np.int64).reshape(len(members), len(weeks))
+        places = self.places(memberXP, weeks)
+        frames = []
+        for name, xp, place in zip(members, memberXP, places):
+            levels = isomeriacore.getLevel(xp)
+            frames.append(pd.DataFrame({'semana': self.weekDates[weeks], 'Nome': name, 'XP': xp, 'Level': levels,
+                                        'Ranking': isomeriacore.getRanking(levels), 'Posição': place}))
+        if not frames:
+            return pd.DataFrame(columns=['semana', 'Nome', 'XP', 'Level', 'Ranking', 'Posição'])
+        return pd.concat(frames, ignore_index=True)
+
+
+@diagnostics.timed
+def buildCube(activityStore):
+    """Build the aggregate cube of an activity store.
+    """
+    return AggregateCube(activityStore)
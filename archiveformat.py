@@ -0,0 +1,156 @@
+"""Read and write the player files of a weekly data archive.
+
+Each player is stored in the .zip archive either as a .csv file (weeks as index, activities as columns "0".."9") or
+as a compressed binary .npz file holding a 'weeks' array (datetime64[D]) and a typed 'counts' array (week x activity).
+Both layouts are detected from the file extension and can be mixed in the same archive. membros.csv is always kept as
+.csv.
+Counts are read as integers, checked against the expected schema and stored in the smallest integer dtype that holds
+them (ACTIVITY_DTYPE, int8, unless a count is larger than 127).
+
+Run as a script to convert an archive between both layouts:
+    python archiveformat.py weeklyData.zip weeklyData-npz.zip --format npz
+"""
+import argparse
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+FORMATS = ('csv', 'npz')
+MEMBERS_FILE = 'membros.csv'
+ACTIVITY_DTYPE = np.int8
+COUNT_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def memberFormat(filename):
+    """Return the format ('csv' or 'npz') of an archive file from its extension.
+    """
+    return filename.rsplit('.', 1)[-1]
+
+
+def playerName(filename):
+    """Return the player name of an archive file.
+    """
+    return filename.rsplit('.', 1)[0]
+
+
+def fitDtype(counts):
+    """Return the smallest integer dtype of COUNT_DTYPES that holds every (non-negative) count.
+    """
+    top = int(np.max(counts)) if np.size(counts) else 0
+    for dtype in COUNT_DTYPES:
+        if top <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def weekKeys(weeks):
+    """Return the '%Y-%m-%d' keys of the weeks of a player file, given as datetime64[D] or as '%Y-%m-%d' strings.
+    A ValueError is raised for anything else, e.g. a missing week or a date with a time.
+    """
+    weeks = np.asarray(weeks)
+    dates = weeks.astype('datetime64[D]')
+    keys = dates.astype('U10')
+    invalid = np.isnat(dates) if weeks.dtype.kind == 'M' else np.isnat(dates) | (keys != weeks.astype(str))
+    if invalid.any():
+        raise ValueError('invalid week {!r}, expected a %Y-%m-%d date'.format(str(weeks[invalid][0])))
+    return keys
+
+
+def mergeWeeks(weeks, counts):
+    """Return the weeks and counts of a player file with the rows of repeated weeks summed into a single row.
+    Older versions of the app appended a second row when a week was submitted twice, and both rows counted.
+    """
+    uniqueWeeks, rows = np.unique(weeks, return_inverse=True)
+    if len(uniqueWeeks) == len(weeks):
+        return weeks, counts
+    merged = np.zeros((len(uniqueWeeks), np.shape(counts)[1]), dtype=np.int64)
+    np.add.at(merged, rows, counts)
+    return uniqueWeeks, merged
+
+
+def isPlainCounts(values, columnCount):
+    """Return whether the counts of a .csv row are exactly columnCount unsigned integers separated by commas.
+    """
+    fields = values.split(',')
+    return len(fields) == columnCount and all(field.isdigit() and field.isascii() for field in fields)
+
+
+def parseCsv(data):
+    """Parse the bytes of a player .csv file into its activity columns, weeks (as written) and int64 counts.
+    Files in the plain layout written by encodePlayer (an unquoted week and one non-empty unsigned integer per column in
+    every row) are split directly with numpy; anything else (quoted fields, other separators, ragged rows, non-integer
+    counts...) goes through a typed pandas parse, which reports what is wrong.
+    """
+    header, *lines = data.decode().splitlines()
+    columns = header.split(',')[1:]
+    rows = [line.split(',', 1) for line in lines if line]
+    if all(len(row) == 2 and '"' not in row[0] and isPlainCounts(row[1], len(columns)) for row in rows):
+        values = ','.join(row[1] for row in rows)
+        counts = np.fromstring(values, dtype=np.int64, sep=',') if rows else np.zeros(0, dtype=np.int64)
+        return columns, np.array([row[0] for row in rows], dtype=str), counts.reshape(len(rows), len(columns))
+    frame = pd.read_csv(io.BytesIO(data), index_col=0, dtype=dict.fromkeys(columns, np.int64))
+    return [str(column) for column in frame.columns], frame.index.to_numpy(dtype=str), frame.to_numpy()
+
+
+def readPlayer(z, filename, activityCount=None):
+    """Return the weeks ('%Y-%m-%d' strings) and the (week x activity) counts of a player file in the open zip z.
+    Counts are parsed as integers, the rows of a repeated week are summed, and counts are returned in the smallest
+    dtype that fits them. If activityCount is given, the file must have exactly that many activity columns
+    ("0".."activityCount-1"), and a ValueError naming the file is raised for any other schema, invalid week,
+    non-integer or negative count.
+    """
+    data = z.read(filename)
+    try:
+        if memberFormat(filename) == 'npz':
+            with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+                weeks, counts = npz['weeks'], npz['counts']
+            if counts.dtype.kind not in 'iu':
+                raise ValueError('counts are not integers')
+            columns = [str(i) for i in range(np.shape(counts)[1])] if np.ndim(counts) == 2 else None
+        else:
+            columns, weeks, counts = parseCsv(data)
+        weeks = weekKeys(weeks)
+    except (ValueError, TypeError, KeyError, OSError) as error:
+        raise ValueError('{}: {}'.format(filename, error)) from None
+    if activityCount is not None and columns != [str(i) for i in range(activityCount)]:
+        raise ValueError('{}: expected the activity columns 0..{}, found {}'.format(filename, activityCount-1, columns))
+    if np.size(counts) and np.min(counts) < 0:
+        raise ValueError('{}: negative activity counts'.format(filename))
+    weeks, counts = mergeWeeks(weeks, counts)
+    return weeks, counts.astype(fitDtype(counts), copy=False)
+
+
+def encodePlayer(weeks, counts, fmt):
+    """Return the bytes of a player file with the given weeks and (week x activity) counts, in the given format.
+    """
+    if fmt == 'npz':
+        npz = io.BytesIO()
+        np.savez_compressed(npz, weeks=np.asarray(weeks, dtype='datetime64[D]'),
+                            counts=np.asarray(counts).astype(fitDtype(counts)))
+        return npz.getvalue()
+    frame = pd.DataFrame(counts, index=weeks, columns=np.arange(0, np.shape(counts)[1]).astype('str'))
+    return frame.to_csv().encode()
+
+
+def convertArchive(source, target, fmt):
+    """Write a copy of the source archive to target with every player file converted to fmt.
+    source and target can be file names or file objects.
+    """
+    with zipfile.ZipFile(source) as oldZip, zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as newZip:
+        for filename in oldZip.namelist():
+            if filename == MEMBERS_FILE:
+                newZip.writestr(filename, oldZip.read(filename))
+            else:
+                weeks, counts = readPlayer(oldZip, filename)
+                newZip.writestr(playerName(filename)+'.'+fmt, encodePlayer(weeks, counts, fmt))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a weekly data archive between the .csv and .npz layouts.')
+    parser.add_argument('source', help='archive to convert')
+    parser.add_argument('target', help='converted archive to write')
+    parser.add_argument('--format', choices=FORMATS, default='npz', help='player file format of the converted archive')
+    args = parser.parse_args()
+    convertArchive(args.source, args.target, args.format)
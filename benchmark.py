@@ -0,0 +1,150 @@
+"""Time and memory benchmarks of the WebApp data paths on synthetic archives.
+
+Synthetic archives of each size are built with create_sample.create_synthetic, then every operation is timed over
+several repeats and run once more under tracemalloc to record its peak memory. Results are written as JSON so runs of
+different versions can be compared:
+    python benchmark.py --sizes small medium --output novo.json
+    python benchmark.py --sizes small medium --compare antigo.json
+"""
+import argparse
+import datetime
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import aggregates
+import create_sample
+import isomeriacore
+from charts import barplot, XPlineplot, chartSpec
+
+SIZES = {
+    'small': dict(members=50, weeks=52),
+    'medium': dict(members=500, weeks=156),
+    'large': dict(members=3000, weeks=260),
+}
+
+
+def operations(archive):
+    """Return the benchmarked operations as (name, setup, run) tuples, where setup() returns the argument of run.
+    """
+    store = isomeriacore.open_zip(io.BytesIO(archive))
+    player = store.players[len(store.players) // 2]
+    week = store.weekLabels[-1]
+    activities = {activity: 1 for activity in isomeriacore.activities['Atividades']}
+    today = datetime.date(2030, 1, 1)
+    lastWeek = datetime.date.fromisoformat(str(store.weeks[-1]))
+
+    def editedSession():
+        session = isomeriacore.SessionStore(store)
+        isomeriacore.updatePlayerActivity(session, player, activities, today)
+        return session
+
+    def edit(args):
+        session, summary = args
+        deltaXP = isomeriacore.updatePlayerActivity(session, player, activities, today)
+        isomeriacore.updateSummary(summary, player, deltaXP)
+
+    def editedCube():
+        session = isomeriacore.SessionStore(store)
+        isomeriacore.updatePlayerActivity(session, player, activities, lastWeek)
+        return session, aggregates.buildCube(store).copy()
+
+    cube = aggregates.buildCube(store)
+    return [
+        ('open_zip', lambda: io.BytesIO(archive), isomeriacore.open_zip),
+        ('summaryTable first_run', lambda: store, isomeriacore.summaryTable),
+        ('summaryTable update', lambda: (editedSession(), isomeriacore.summaryTable(store)),
+         lambda args: isomeriacore.summaryTable(args[0], args[1], kind='update')),
+        ('updatePlayerActivity + updateSummary',
+         lambda: (isomeriacore.SessionStore(store), isomeriacore.summaryTable(store)), edit),
+        ('getTotalActivity', lambda: store, isomeriacore.getTotalActivity),
+        ('getWeekActivity', lambda: store, lambda store: isomeriacore.getWeekActivity(store, week)),
+        ('getAvailableDates', lambda: store, isomeriacore.getAvailableDates),
+        ('journal materialise', editedSession, lambda session: session.journal.materialise(session)),
+        ('barplot', lambda: store,
+         lambda store: chartSpec(barplot(isomeriacore.getMean(isomeriacore.getTotalActivity(store))))),
+        ('buildCube', lambda: store, aggregates.buildCube),
+        ('cube update', editedCube, lambda args: args[1].update(args[0], [player], str(store.weeks[-1]))),
+        ('XPlineplot', lambda: cube, lambda cube: chartSpec(XPlineplot(cube, player))),
+        ('leaderboardHistory', lambda: cube, lambda cube: cube.leaderboardHistory(cube.memberNames[:5])),
+    ]
+
+
+def measure(setup, run, repeat):
+    """Return the median and minimum time of run(setup()) over repeat runs, and its peak traced memory.
+    """
+    times = []
+    for i in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        run(argument)
+        times.append(time.perf_counter() - start)
+    argument = setup()
+    tracemalloc.start()
+    run(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'peak_bytes': peak}
+
+
+def gitVersion():
+    """Return the current git commit, if available.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def runBenchmarks(sizes, repeat, density, missing, fmt):
+    """Run every operation on a synthetic archive of each size and return the results.
+    """
+    results = []
+    for size in sizes:
+        archive = io.BytesIO()
+        create_sample.create_synthetic(archive, density=density, missing=missing, fmt=fmt, **SIZES[size])
+        archive = archive.getvalue()
+        for name, setup, run in operations(archive):
+            result = dict(size=size, operation=name, archive_bytes=len(archive), **SIZES[size])
+            result.update(measure(setup, run, repeat))
+            results.append(result)
+            print('{:<8} {:<38} {:>10.4f} s {:>12,} B'.format(size, name, result['median_s'], result['peak_bytes']))
+    return {'version': gitVersion(), 'python': platform.python_version(), 'repeat': repeat, 'density': density,
+            'missing': missing, 'format': fmt, 'results': results}
+
+
+def compare(report, baseline):
+    """Print the time and memory ratios of report against a baseline report.
+    """
+    old = {(result['size'], result['operation']): result for result in baseline['results']}
+    print('\n{:<8} {:<38} {:>8} {:>8}   (vs {})'.format('size', 'operation', 'time', 'memory', baseline['version']))
+    for result in report['results']:
+        key = (result['size'], result['operation'])
+        if key in old:
+            print('{:<8} {:<38} {:>7.2f}x {:>7.2f}x'.format(
+                *key, result['median_s'] / old[key]['median_s'],
+                result['peak_bytes'] / max(old[key]['peak_bytes'], 1)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the WebApp data paths on synthetic archives.')
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--density', type=float, default=0.5)
+    parser.add_argument('--missing', type=float, default=0.1)
+    parser.add_argument('--format', choices=['csv', 'npz'], default='csv')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    args = parser.parse_args()
+    report = runBenchmarks(args.sizes, args.repeat, args.density, args.missing, args.format)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            compare(report, json.load(baseline))
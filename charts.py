@@ -0,0 +1,99 @@
+"""Altair charts of the Isomeria WebApp.
+"""
+import threading
+
+import altair as alt
+
+import diagnostics
+import isomeriacore
+
+_specLock = threading.Lock()
+
+@diagnostics.timed
+def barplot(df, date=None, selectedPlayer=None, kind='total'):
+    """Create activities barplot.
+    kind='total' returns a barplot with x-label indicating the average is for the whole period
+    kind='weekly' returns a barplot with x-label indicating the average is for a specific week
+    """
+    df = df.reset_index()
+    df['XP da atividade'] = isomeriacore.activities['Pontos']
+    df.columns = ['Atividades', ' ', 'XP da atividade']
+    if kind=='total':        
+        title = 'Número médio de atividades realizadas em todo o período'
+    elif kind=='weekly':
+        title = 'Número médio de atividades realizadas na semana de {}'.format(date[:5])
+        if selectedPlayer is not None:
+            title = 'Atividades realizadas na semana de {} - {}'.format(date[:5], selectedPlayer)
+    bars = alt.Chart(df, title=title).mark_bar(
+        cornerRadiusTopLeft=3,
+        cornerRadiusTopRight=3
+    ).encode(
+        x=alt.X(df.columns[1]+':Q', axis=alt.Axis(tickMinStep=1)),
+        y=alt.Y(df.columns[0]+':N', sort='color'),
+        color=alt.Color(df.columns[2]+':O', scale=alt.Scale(scheme="plasma"))
+    )
+    text = bars.mark_text(
+        align='left',
+        baseline='middle',
+        dx=3  # Nudges text to right so it doesn't appear on top of the bar
+    ).encode(
+        text=alt.Text(df.columns[1]+':Q', format='.2')
+    )
+    barplot = (bars+text).properties(width = 797, height=400)
+    return barplot
+
+@diagnostics.timed
+def XPlineplot(cube, selectedPlayer):
+    """Create individual player XP line plot from the weekly XP of the aggregate cube.
+    Only the week and XP columns are embedded, and the axis ticks are left to Vega-Lite instead of listing every week.
+    """
+    plotdata = cube.playerXP(selectedPlayer)[['semana', 'XP']]
+    XPlineplot = alt.Chart(
+        plotdata,
+        width = 697, height=400,
+        title='XP semanal - {}'.format(selectedPlayer)
+    ).mark_area(
+        point={'color':'#744a98', 'size':70},
+        line={'color':'#744a98'},
+        color=alt.Gradient(
+            gradient='linear',
+            stops=[alt.GradientStop(color='#23ac76', offset=0),
+                   alt.GradientStop(color='#23ac7640', offset=1)],
+            x1=1.5,
+            x2=1.25,
+            y1=1,
+            y2=0.1
+        )).encode(
+        alt.X('semana:T', axis=alt.Axis(format='%d/%m', grid=False)),
+        alt.Y('XP:Q')
+    )
+    return XPlineplot
+
+
+@diagnostics.timed
+def leaderboardplot(history):
+    """Create the leaderboard over time line plot: the weekly leaderboard place of each member in history, as
+    returned by AggregateCube.leaderboardHistory.
+    """
+    leaderboardplot = alt.Chart(
+        history,
+        width = 697, height=400,
+        title='Posição no ranking ao longo do tempo'
+    ).mark_line(point=True).encode(
+        alt.X('semana:T', axis=alt.Axis(format='%d/%m', grid=False)),
+        alt.Y('Posição:Q', scale=alt.Scale(reverse=True, zero=False), axis=alt.Axis(tickMinStep=1)),
+        alt.Color('Nome:N', scale=alt.Scale(scheme='plasma')),
+        tooltip=['Nome:N', alt.Tooltip('semana:T', format='%d/%m/%y'), 'Posição:Q', 'XP:Q', 'Level:Q', 'Ranking:N']
+    )
+    return leaderboardplot
+
+
+@diagnostics.timed
+def chartSpec(chart):
+    """Return the Vega-Lite spec of a chart as a plain dict, with its data embedded once as a dataset named after
+    a hash of its content, so the same chart always gives the same spec.
+    Altair's 5000 row limit is lifted while the spec is built (long leaderboards go past it); the data transformer is
+    process-wide, so specs are built one at a time.
+    """
+    with _specLock, alt.data_transformers.enable('default', max_rows=None):
+        return chart.to_dict()
@@ -0,0 +1,77 @@
+"""Lazily evaluated values with explicit dependencies, pulled by the app pages that need them.
+
+Each node is a function declared with the nodes it is computed from:
+
+    graph = Graph(datacache.cache)
+
+    @graph.node('activityStore', 'dataVersion')
+    def summary(activityStore, dataVersion):
+        return summaryTable(activityStore)
+
+    graph.get('summary')
+
+Nothing is computed until a node is pulled with get, and then only the nodes it depends on are. A node's key is its
+name, its extra arguments and the keys of its inputs; source nodes have no inputs and an explicit key function instead
+(e.g. the hash of the uploaded archive). A node is only recomputed when its key changes: values are memoised in the
+data cache (or, for uncached nodes, for the rest of the rerun).
+"""
+import diagnostics
+
+
+class Graph:
+    """A set of lazily evaluated nodes backed by a data cache.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self.nodes = {}
+        self.values = {}
+
+    def node(self, *inputs, key=None, cached=True):
+        """Declare the decorated function as a node named after it, computed from the values of the input nodes and
+        any extra arguments given to get. key, for source nodes, returns the node's key.
+        cached=False keeps the value for the current rerun only, for values that are cheap or held elsewhere.
+        """
+        def declare(compute):
+            self.nodes[compute.__name__] = (compute, inputs, key, cached)
+            return compute
+        return declare
+
+    def key(self, name, *args):
+        """Return the current key of a node.
+        """
+        compute, inputs, key, cached = self.nodes[name]
+        if key is not None:
+            return (name, key()) + args
+        return (name,) + tuple(self.key(i) for i in inputs) + args
+
+    def get(self, name, *args):
+        """Return the value of a node, computing it and its inputs only if their keys changed.
+        """
+        compute, inputs, key, cached = self.nodes[name]
+        nodeKey = self.key(name, *args)
+        if nodeKey in self.values:
+            return self.values[nodeKey]
+
+        def build():
+            values = [self.get(i) for i in inputs]
+            with diagnostics.section(name):
+                return compute(*values, *args)
+
+        value = self.cache.get(nodeKey, build) if cached else build()
+        self.values[nodeKey] = value
+        return value
+
+    def put(self, name, value, *args):
+        """Set the value of a node for its current key, e.g. after it was updated in place.
+        """
+        nodeKey = self.key(name, *args)
+        self.values[nodeKey] = value
+        if self.nodes[name][3]:
+            self.cache.put(nodeKey, value)
+
+    def discard(self, name, *args):
+        """Drop the value of a node for its current key.
+        """
+        nodeKey = self.key(name, *args)
+        self.values.pop(nodeKey, None)
+        self.cache.discard(nodeKey)
@@ -1,11 +1,49 @@
-def create_sample():
+import zipfile
+import numpy as np
+import pandas as pd
+import archiveformat
+
+def create_sample(fmt='csv'):
     """Creates an empty, simple, sample to play around with in the WebApp
+    fmt='csv' writes each player as a .csv file, fmt='npz' as a binary .npz file
     """
     names = ['Marie Curie', 'Eistein', 'Isaac Newton', 'Galileu', 'Katherine Johnson']
     occupation = ['Cientista' for name in names]
-    sampleData = {name:pd.DataFrame(columns=[str(x) for x in range(10)]) for name in names}
+    sampleData = {name:np.empty((0, 10), dtype=archiveformat.ACTIVITY_DTYPE) for name in names}
     sampleMembers = pd.DataFrame([names, occupation], index=['Nome', 'Cargo']).T
     with zipfile.ZipFile('SAMPLE.zip', 'w') as csv_zip:
         for name in names:
-            csv_zip.writestr(name+'.csv', sampleData[name].to_csv())
-        csv_zip.writestr('membros.csv', sampleMembers.to_csv())
\ No newline at end of file
+            csv_zip.writestr(name+'.'+fmt, archiveformat.encodePlayer([], sampleData[name], fmt))
+        csv_zip.writestr('membros.csv', sampleMembers.to_csv())
+
+def create_synthetic(filename='SYNTHETIC.zip', members=100, weeks=52, density=0.5, missing=0.1, fmt='csv', seed=0):
+    """Creates a synthetic archive with random weekly activities, to test the WebApp at scale
+    members players get up to weeks weekly rows. Each activity is done in a week with probability density (a Poisson
+    number of times) and each player misses a week with probability missing.
+    filename can also be a file object.
+    """
+    rng = np.random.default_rng(seed)
+    names = ['Membro {:05d}'.format(i) for i in range(members)]
+    occupation = [['Trainee', 'Assessor', 'Gerente', 'Diretor'][i % 4] for i in range(members)]
+    dates = pd.date_range('2020-01-05', periods=weeks, freq='7D').strftime('%Y-%m-%d').to_numpy()
+    syntheticMembers = pd.DataFrame([names, occupation], index=['Nome', 'Cargo']).T
+    with zipfile.ZipFile(filename, 'w') as csv_zip:
+        for name in names:
+            weeksWithData = dates[rng.random(weeks) >= missing]
+            done = rng.random((len(weeksWithData), 10)) < density
+            counts = np.minimum(done * (1 + rng.poisson(1.5, done.shape)), 100)
+            csv_zip.writestr(name+'.'+fmt, archiveformat.encodePlayer(weeksWithData, counts, fmt))
+        csv_zip.writestr('membros.csv', syntheticMembers.to_csv())
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Create a synthetic weekly data archive to test the WebApp at scale.')
+    parser.add_argument('filename', nargs='?', default='SYNTHETIC.zip')
+    parser.add_argument('--members', type=int, default=100)
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--density', type=float, default=0.5, help='probability of each activity being done in a week')
+    parser.add_argument('--missing', type=float, default=0.1, help='probability of a player missing a week')
+    parser.add_argument('--format', choices=archiveformat.FORMATS, default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    create_synthetic(args.filename, args.members, args.weeks, args.density, args.missing, args.format, args.seed)
@@ -0,0 +1,97 @@
+"""Size-bounded LRU cache for loaded archives and the results derived from them.
+
+Entries are keyed by tuples such as ('summary', archiveHash(data), version): a fast hash of the archive bytes plus
+the data version, so an edited dataset never reads a stale result. The cache lives in this module, so it is shared
+by every rerun and session of the app. Its memory budget is read from the ISOMERIA_CACHE_MB environment variable.
+"""
+import collections
+import hashlib
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUDGET_MB = 256
+
+
+def archiveHash(data):
+    """Return a short hex digest of the archive bytes.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def sizeOf(value):
+    """Return an estimate, in bytes, of the memory held by a cached value.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(sizeOf(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeOf(key) + sizeOf(item) for key, item in value.items())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Least recently used cache bounded by the estimated memory of its entries.
+    """
+    def __init__(self, maxBytes):
+        self.maxBytes = maxBytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.RLock()
+
+    def get(self, key, compute):
+        """Return the value cached under key, computing and caching it on a miss.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+            self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Cache value under key and evict the least recently used entries over the budget.
+        """
+        with self.lock:
+            self.discard(key)
+            size = sizeOf(value)
+            self.entries[key] = (value, size)
+            self.size += size
+            self.evict()
+
+    def discard(self, key):
+        """Remove key from the cache, if present.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+
+    def evict(self):
+        """Evict least recently used entries until the cache fits its budget.
+        """
+        with self.lock:
+            while self.size > self.maxBytes and self.entries:
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def stats(self):
+        """Return the cache counters and its current size.
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.size, 'maxBytes': self.maxBytes}
+
+
+cache = LRUCache(int(float(os.environ.get('ISOMERIA_CACHE_MB', DEFAULT_BUDGET_MB)) * 1024**2))
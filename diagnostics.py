@@ -0,0 +1,129 @@
+"""Per-rerun timing diagnostics of the app's data paths.
+
+Data functions are wrapped with @timed and page branches with `with section(name):`. While a rerun is being recorded
+(between startRun and endRun), each call records its wall time, the number of rows it returned and the data cache
+hits and misses it caused (the cache is shared, so these include other sessions' concurrent reruns), nested under the
+call that made it. Finished reruns are kept in a short history, written as one JSON line each to the
+'isomeria.diagnostics' logger and can be exported as JSON.
+
+Recording is off unless the ISOMERIA_DIAGNOSTICS environment variable is set (or setEnabled(True) is called). When it
+is off, no rerun is started and a timed call costs a single attribute lookup before calling the function.
+"""
+import collections
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+import datacache
+
+HISTORY_SIZE = 50
+
+enabled = os.environ.get('ISOMERIA_DIAGNOSTICS', '') not in ('', '0')
+history = collections.deque(maxlen=HISTORY_SIZE)
+logger = logging.getLogger('isomeria.diagnostics')
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def setEnabled(flag):
+    """Turn the recording of reruns on or off.
+    """
+    global enabled
+    enabled = bool(flag)
+
+
+def rowCount(result):
+    """Return the number of rows of a data function's result, or None if it has no rows.
+    Tuples are counted by their first item, e.g. the activity frame of getWeekActivity(kind='all'), and activity
+    stores by their players.
+    """
+    if isinstance(result, tuple):
+        return rowCount(result[0]) if result else None
+    if hasattr(result, 'shape'):
+        return int(result.shape[0]) if result.shape else None
+    if isinstance(result, (list, dict)):
+        return len(result)
+    if hasattr(result, 'players'):
+        return len(result.players)
+    return None
+
+
+def startRun(session=None):
+    """Start recording a rerun of the current script thread, if diagnostics are enabled.
+    """
+    if not enabled:
+        _local.run = None
+        return
+    stats = datacache.cache.stats()
+    _local.run = {'session': session, 'started': time.time(), 'clock': time.perf_counter(),
+                  'cache': (stats['hits'], stats['misses']), 'depth': 0, 'records': []}
+
+
+@contextlib.contextmanager
+def section(name):
+    """Record the time, cache hits and misses of the enclosed block in the current rerun.
+    The row count of a section can be set through the yielded record, e.g. record['rows'] = len(frame).
+    """
+    run = getattr(_local, 'run', None)
+    if run is None:
+        yield {}
+        return
+    stats = datacache.cache.stats()
+    record = {'name': name, 'depth': run['depth'], 'seconds': None, 'rows': None}
+    run['records'].append(record)
+    run['depth'] += 1
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        run['depth'] -= 1
+        after = datacache.cache.stats()
+        record['cacheHits'] = after['hits'] - stats['hits']
+        record['cacheMisses'] = after['misses'] - stats['misses']
+
+
+def timed(function):
+    """Decorate a data function so its calls are recorded, with their row counts, in the current rerun.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'run', None) is None:
+            return function(*args, **kwargs)
+        with section(function.__name__) as record:
+            result = function(*args, **kwargs)
+            record['rows'] = rowCount(result)
+        return result
+    return wrapper
+
+
+def endRun():
+    """Finish recording the current rerun, log it and add it to the history. Return the finished rerun, or None if
+    no rerun was being recorded.
+    """
+    run = getattr(_local, 'run', None)
+    _local.run = None
+    if run is None:
+        return None
+    stats = datacache.cache.stats()
+    finished = {'session': run['session'],
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(run['started'])),
+                'seconds': time.perf_counter() - run['clock'],
+                'cacheHits': stats['hits'] - run['cache'][0], 'cacheMisses': stats['misses'] - run['cache'][1],
+                'cacheBytes': stats['bytes'], 'records': run['records']}
+    with _lock:
+        history.append(finished)
+    logger.info(json.dumps(finished, default=str))
+    return finished
+
+
+def exportRuns(session=None):
+    """Return the recorded reruns of session (all sessions if None), oldest first, as JSON text.
+    """
+    with _lock:
+        runs = [run for run in history if session is None or run['session'] == session]
+    return json.dumps(runs, indent=2, default=str)
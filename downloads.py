@@ -0,0 +1,106 @@
+"""Streamed file downloads served by the Streamlit server.
+
+Instead of embedding a whole file in the page as a base64 data: URI, a download is registered here with a producer
+function and the page only links to it. The content is produced lazily on the first request, cached until the data
+version changes and sent to the browser in chunks. Downloads belong to the session that registered them and are
+dropped, with their producers and content, once that session is no longer connected.
+"""
+import gc
+import threading
+import uuid
+
+import tornado.ioloop
+import tornado.web
+from streamlit import config
+from streamlit.server.server_util import make_url_path_regex
+
+import sessions
+
+CHUNK_SIZE = 64 * 1024
+
+_downloads = {}
+_downloadsByToken = {}
+_lock = threading.Lock()
+_routeInstalled = False
+
+
+class Download:
+    """A registered download: file name, content type and the producer of its content for one data version.
+    """
+    def __init__(self, filename, contentType, producer, version):
+        self.token = uuid.uuid4().hex
+        self.filename = filename
+        self.contentType = contentType
+        self.producer = producer
+        self.version = version
+        self.data = None
+        self.lock = threading.Lock()
+
+    def content(self):
+        """Return the download content, producing it on the first call.
+        """
+        with self.lock:
+            if self.data is None:
+                self.data = self.producer()
+            return self.data
+
+
+class DownloadHandler(tornado.web.RequestHandler):
+    """Serve a registered download in chunks.
+    """
+    async def get(self, token):
+        download = _downloadsByToken.get(token)
+        if download is None:
+            raise tornado.web.HTTPError(404)
+        content = await tornado.ioloop.IOLoop.current().run_in_executor(None, download.content)
+        self.set_header('Content-Type', download.contentType)
+        self.set_header('Content-Disposition', 'attachment; filename="{}"'.format(download.filename))
+        view = memoryview(content)
+        for start in range(0, len(view), CHUNK_SIZE):
+            self.write(bytes(view[start:start+CHUNK_SIZE]))
+            await self.flush()
+
+
+def installRoute():
+    """Add the download route to the running Streamlit tornado application, once.
+    Streamlit does not keep a reference to its application, so it is looked up among the live objects.
+    """
+    global _routeInstalled
+    with _lock:
+        if _routeInstalled:
+            return
+        app = next((obj for obj in gc.get_objects() if isinstance(obj, tornado.web.Application)), None)
+        if app is None:
+            raise RuntimeError('Downloads can only be served from a running Streamlit server')
+        base = config.get_option('server.baseUrlPath')
+        app.add_handlers(r'.*', [(make_url_path_regex(base, 'download', r'(\w+)'), DownloadHandler)])
+        _routeInstalled = True
+
+
+def pruneDownloads():
+    """Drop the downloads of sessions that are no longer connected.
+    """
+    active = sessions.activeSessions()
+    if active is None:
+        return
+    with _lock:
+        for key in [key for key in _downloads if key[0] not in active]:
+            del _downloadsByToken[_downloads.pop(key).token]
+
+
+def registerDownload(key, version, filename, contentType, producer):
+    """Register the producer of a download under key for the current session and return its relative url.
+    The registered download, and its cached content, is kept while version does not change.
+    """
+    installRoute()
+    pruneDownloads()
+    key = (sessions.sessionId(), key)
+    with _lock:
+        download = _downloads.get(key)
+        if download is None or download.version != version or download.filename != filename:
+            if key in _downloads:
+                del _downloadsByToken[_downloads[key].token]
+            download = Download(filename, contentType, producer, version)
+            _downloads[key] = download
+            _downloadsByToken[download.token] = download
+    return 'download/' + download.token
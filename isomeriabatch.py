@@ -0,0 +1,73 @@
+"""Write the summary table of many weekly data archives at once, e.g. every team's weekly .zip, from a cron job.
+
+Archives are loaded and scored in parallel across a process pool, without starting the WebApp:
+    python isomeriabatch.py team1.zip team2.zip --output-dir resumos --workers 4
+
+Each archive gets a <archive name>-summary.csv file, in the same layout as the app's summary download. Archives that
+share a name are told apart by their folders: team1/weeklyData.zip and team2/weeklyData.zip are written to
+team1-weeklyData-summary.csv and team2-weeklyData-summary.csv.
+"""
+import argparse
+import concurrent.futures
+import os
+import sys
+
+
+def outputNames(archives):
+    """Return the summary file name of each archive, prefixed with the folders that tell apart archives with the same
+    name. Raise a ValueError if two archives would still be written to the same file.
+    """
+    stems = [os.path.splitext(os.path.basename(archive))[0] for archive in archives]
+    names = {}
+    for stem in set(stems):
+        group = [archive for archive, other in zip(archives, stems) if other == stem]
+        if len(group) == 1:
+            names[group[0]] = stem + '-summary.csv'
+            continue
+        paths = [os.path.splitext(os.path.abspath(archive))[0] for archive in group]
+        parent = os.path.commonpath([os.path.dirname(path) for path in paths])
+        for archive, path in zip(group, paths):
+            names[archive] = os.path.relpath(path, parent).replace(os.sep, '-') + '-summary.csv'
+    outputs = [names[archive] for archive in archives]
+    duplicates = sorted({name for name in outputs if outputs.count(name) > 1})
+    if duplicates:
+        raise ValueError('several archives would be written to {}'.format(', '.join(duplicates)))
+    return outputs
+
+
+def summariseArchive(archive, output):
+    """Write the summary table of a single archive to the output file and return its path.
+    """
+    import isomeriacore
+    activityStore = isomeriacore.open_zip(archive)
+    summary = isomeriacore.summaryTable(activityStore)
+    summary.to_csv(output, index=False)
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the summary table of many weekly data archives at once.')
+    parser.add_argument('archives', nargs='+', help='weekly data archives (.zip)')
+    parser.add_argument('--output-dir', default='.', help='directory where the summary tables are written')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+    try:
+        outputs = outputNames(args.archives)
+    except ValueError as error:
+        parser.error(str(error))
+    os.makedirs(args.output_dir, exist_ok=True)
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(summariseArchive, archive, os.path.join(args.output_dir, output)): archive
+                   for archive, output in zip(args.archives, outputs)}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                print('{} -> {}'.format(futures[future], future.result()))
+            except Exception as error:
+                failed += 1
+                print('{}: {}'.format(futures[future], error), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
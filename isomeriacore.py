@@ -0,0 +1,703 @@
+"""Data and scoring functions of the Isomeria WebApp, without any user interface.
+
+This module loads weekly data archives into activity stores and scores members' XP, levels and rankings. It does not
+import streamlit or altair, and the reference tables (atividades.csv, progressao.csv and elementlist.csv) are only read
+the first time they are needed, so it can be imported quickly by the app, scripts and batch jobs alike:
+
+    import isomeriacore
+    activityStore = isomeriacore.open_zip('weeklyData.zip')
+    summary = isomeriacore.summaryTable(activityStore)
+"""
+import functools
+import io
+import os
+import threading
+import types
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import archiveformat
+import datacache
+import diagnostics
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+#
+# READ FILES
+@functools.lru_cache(maxsize=None)
+def referenceTables():
+    """Read the activities, progression and element list tables, once, along with the sorted lookup arrays used to
+    score XP, levels and rankings for all members at once.
+    """
+    activities = pd.read_csv(os.path.join(DATA_DIR, 'atividades.csv'), index_col=0)
+    progression = pd.read_csv(os.path.join(DATA_DIR, 'progressao.csv')).sort_values(by='xp', ignore_index=True)
+    element_list = pd.read_csv(os.path.join(DATA_DIR, 'elementlist.csv'), names=['M', 'element_initial', 'element'])
+    element_list = element_list.sort_values(by='M', ignore_index=True)
+    return types.SimpleNamespace(
+        activities=activities,
+        progression=progression,
+        element_list=element_list,
+        activityPoints=activities['Pontos'].to_numpy(dtype=np.int64),
+        levelXP=progression['xp'].to_numpy(),
+        levelNumber=progression['nivel'].to_numpy(),
+        elementM=element_list['M'].to_numpy(),
+        elementName=element_list['element'].to_numpy(),
+    )
+
+def __getattr__(name):
+    """Give module level access to the reference tables (isomeriacore.activities, ...), reading them on first use.
+    """
+    tables = referenceTables()
+    if name in vars(tables):
+        return getattr(tables, name)
+    raise AttributeError("module 'isomeriacore' has no attribute '{}'".format(name))
+
+#
+# ACTIVITY STORE
+class ActivityStore:
+    """Compact activity store with every player's weekly activity counts in a single dense array.
+    counts has shape player x week x activity and present flags which weeks each player has data for.
+    Players, weeks and activities are mapped to integer positions through playerIndex, weekIndex and activityIndex.
+    Weeks form a calendar index parsed once at load: weeks holds the sorted '%Y-%m-%d' keys, weekDates the parsed dates
+    and weekLabels the '%d/%m/%y' labels shown in the app. weekIndex accepts both keys and labels.
+    The store is read only once loaded, so a single store is shared by every session working on the same archive;
+    edits go to each session's SessionStore.
+    """
+    def __init__(self, players, weeks, counts, present, members, archive):
+        self.players = list(players)
+        self.playerIndex = {player: i for i, player in enumerate(self.players)}
+        self.weeks = np.asarray(weeks, dtype='U10')
+        self.weekDates = self.weeks.astype('datetime64[D]')
+        self.weekLabels = pd.DatetimeIndex(self.weekDates).strftime('%d/%m/%y').to_numpy(dtype='U8')
+        self.indexWeeks()
+        self.activityIndex = {activity: i for i, activity in enumerate(referenceTables().activities['Atividades'])}
+        self.counts = counts
+        self.present = present
+        self.members = members
+        self.archive = archive
+        self.totals = None
+
+    def indexWeeks(self):
+        """Map both week keys and week labels to their position in the calendar.
+        """
+        self.weekIndex = {week: i for i, week in enumerate(self.weeks)}
+        self.weekIndex.update({label: i for i, label in enumerate(self.weekLabels)})
+
+    def availableWeeks(self, player=None):
+        """Return the labels of the weeks with data for any player, or for a single player.
+        """
+        present = self.present.any(axis=0) if player is None else self.playerView(player)[1]
+        return self.weekLabels[present]
+
+    def playersWithoutData(self, week):
+        """Return the players that have no data for a week.
+        """
+        present = self.weekView(week)[1]
+        return [player for player, hasData in zip(self.players, present) if not hasData]
+
+    @property
+    def nbytes(self):
+        """Memory held by the store, used by the data cache: its arrays, the archive bytes, the member info and the
+        player and week indexes.
+        """
+        arrays = (self.counts.nbytes + self.present.nbytes + self.weeks.nbytes + self.weekDates.nbytes
+                  + self.weekLabels.nbytes)
+        if self.totals is not None:
+            arrays += self.totals.nbytes
+        return (arrays + len(self.archive) + datacache.sizeOf(self.members) + datacache.sizeOf(self.players)
+                + datacache.sizeOf(self.playerIndex) + datacache.sizeOf(self.weekIndex))
+
+    def playerView(self, player):
+        """Return the (week x activity) counts and the week presence flags of a player, as views on the store.
+        """
+        p = self.playerIndex[player]
+        return self.counts[p], self.present[p]
+
+    def weekView(self, week):
+        """Return the (player x activity) counts and the player presence flags for a week, as views on the store.
+        """
+        w = self.weekIndex[week]
+        return self.counts[:, w], self.present[:, w]
+
+    def totalView(self):
+        """Return the (player*week x activity) counts and presence flags for the whole period, as views on the store.
+        """
+        return self.counts.reshape(-1, self.counts.shape[2]), self.present.reshape(-1)
+
+    def activityMean(self, week=None):
+        """Return the mean number of times each activity was executed, for the whole period or for a single week.
+        Only weeks with data are counted.
+        """
+        counts, present = self.totalView() if week is None else self.weekView(week)
+        activitySum = counts.sum(axis=0, dtype=np.int64)
+        return activitySum / present.sum()
+
+    def playerFrame(self, player):
+        """Return a player's activities as a dataframe in the archive .csv layout.
+        """
+        counts, present = self.playerView(player)
+        return pd.DataFrame(counts[present], index=self.weeks[present],
+                            columns=np.arange(0, counts.shape[1]).astype('str'))
+
+    def playerTotals(self):
+        """Return the (player x activity) sums of every player's counts over the whole period.
+        """
+        if self.totals is None:
+            self.totals = self.counts.sum(axis=1, dtype=np.int64)
+        return self.totals
+
+#
+# CHANGE JOURNAL
+class ChangeJournal:
+    """Append-only journal of the edits made on top of an archive.
+    Edits are recorded as (player, week, counts) entries and the archive is only rewritten when materialise is called,
+    so any number of edits collapses into a single rewrite that only re-serialises the edited players.
+    Downloads materialise the journal from a server thread while the script thread records edits, so both hold lock;
+    an edit holds it while it changes the store and records itself.
+    """
+    def __init__(self, archive):
+        self.archive = archive
+        self.entries = []
+        self.version = 0
+        self.lock = threading.RLock()
+
+    def record(self, player, week, newCounts):
+        """Append an edit to the journal.
+        """
+        with self.lock:
+            self.entries.append((player, week, tuple(int(count) for count in newCounts)))
+            self.version += 1
+
+    def recordWeek(self, players, week, newCounts):
+        """Append the edits of several players for the same week to the journal, as a single new version.
+        """
+        with self.lock:
+            self.entries.extend((player, week, tuple(int(count) for count in playerCounts))
+                                for player, playerCounts in zip(players, newCounts))
+            self.version += 1
+
+    def changedPlayers(self):
+        """Return the set of players edited since the archive was last materialised.
+        """
+        return {player for player, week, newCounts in self.entries}
+
+    @diagnostics.timed
+    def materialise(self, activityStore):
+        """Return the archive bytes with every pending edit applied and clear the journal.
+        Unchanged members are copied from the previous archive as they are; edited players are serialised from the store
+        in the format (.csv or .npz) they already had in the archive.
+        """
+        with self.lock:
+            if not self.entries:
+                return self.archive
+            changed = self.changedPlayers()
+            newArchive = io.BytesIO()
+            with zipfile.ZipFile(io.BytesIO(self.archive)) as oldZip, zipfile.ZipFile(newArchive, 'w') as newZip:
+                for member in oldZip.infolist():
+                    player = archiveformat.playerName(member.filename)
+                    if player in changed and member.filename != archiveformat.MEMBERS_FILE:
+                        counts, present = activityStore.playerView(player)
+                        newZip.writestr(member, archiveformat.encodePlayer(
+                            activityStore.weeks[present], counts[present], archiveformat.memberFormat(member.filename)))
+                    else:
+                        newZip.writestr(member, oldZip.read(member))
+            self.archive = newArchive.getvalue()
+            self.entries = []
+            return self.archive
+
+#
+# SESSION STORE
+class SessionStore:
+    """Copy-on-write view of a shared ActivityStore holding the edits of a single session.
+    The base store is never modified: edits are kept in edits as {player: {week: counts}} and merged with the base
+    on read, so a session only holds its own changes. It offers the same read methods as ActivityStore, and the
+    session's ChangeJournal as journal.
+    """
+    def __init__(self, base):
+        self.base = base
+        self.edits = {}
+        self.players = base.players
+        self.playerIndex = base.playerIndex
+        self.activityIndex = base.activityIndex
+        self.members = base.members
+        self.journal = ChangeJournal(base.archive)
+        self.indexWeeks()
+
+    def indexWeeks(self):
+        """Merge the base calendar with the weeks only present in the edits.
+        baseColumns holds the position of each base week in the merged calendar, or None if both are the same.
+        """
+        editedWeeks = {week for weeks in self.edits.values() for week in weeks}
+        newWeeks = sorted(editedWeeks - set(self.base.weeks))
+        if not newWeeks:
+            self.weeks, self.weekDates = self.base.weeks, self.base.weekDates
+            self.weekLabels, self.weekIndex = self.base.weekLabels, self.base.weekIndex
+            self.baseColumns = None
+            return
+        self.weeks = np.union1d(self.base.weeks, np.asarray(newWeeks, dtype='U10'))
+        self.weekDates = self.weeks.astype('datetime64[D]')
+        self.weekLabels = pd.DatetimeIndex(self.weekDates).strftime('%d/%m/%y').to_numpy(dtype='U8')
+        self.weekIndex = {week: i for i, week in enumerate(self.weeks)}
+        self.weekIndex.update({label: i for i, label in enumerate(self.weekLabels)})
+        self.baseColumns = np.searchsorted(self.weeks, self.base.weeks)
+
+    def expand(self, values):
+        """Place a base array indexed by week on its first axis onto the merged calendar.
+        """
+        if self.baseColumns is None:
+            return values
+        expanded = np.zeros((len(self.weeks),) + values.shape[1:], dtype=values.dtype)
+        expanded[self.baseColumns] = values
+        return expanded
+
+    def baseWeek(self, week):
+        """Return the base (player x activity) counts and presence flags of a week of the merged calendar.
+        """
+        week = self.weeks[self.weekIndex[week]]
+        if week in self.base.weekIndex:
+            return self.base.weekView(week)
+        return (np.zeros((len(self.players), len(self.activityIndex)), dtype=self.base.counts.dtype),
+                np.zeros(len(self.players), dtype=bool))
+
+    @property
+    def nbytes(self):
+        """Memory held by the session's edits, merged calendar and rewritten archive. The base store is not counted.
+        """
+        editBytes = sum(counts.nbytes for weeks in self.edits.values() for counts in weeks.values())
+        if self.journal.archive is not self.base.archive:
+            editBytes += len(self.journal.archive)
+        if self.baseColumns is None:
+            return editBytes
+        return (editBytes + self.weeks.nbytes + self.weekDates.nbytes + self.weekLabels.nbytes + self.baseColumns.nbytes
+                + datacache.sizeOf(self.weekIndex))
+
+    def availableWeeks(self, player=None):
+        """Return the labels of the weeks with data for any player, or for a single player.
+        """
+        if player is not None:
+            return self.weekLabels[self.playerView(player)[1]]
+        present = self.expand(self.base.present.any(axis=0))
+        for weeks in self.edits.values():
+            present[[self.weekIndex[week] for week in weeks]] = True
+        return self.weekLabels[present]
+
+    def playersWithoutData(self, week):
+        """Return the players that have no data for a week.
+        """
+        present = self.weekView(week)[1]
+        return [player for player, hasData in zip(self.players, present) if not hasData]
+
+    def playerView(self, player):
+        """Return the (week x activity) counts and the week presence flags of a player.
+        These are views on the base store unless the player was edited or the calendar changed.
+        """
+        p = self.playerIndex[player]
+        counts, present = self.expand(self.base.counts[p]), self.expand(self.base.present[p])
+        if player in self.edits:
+            counts, present = counts.copy(), present.copy()
+            for week, newCounts in self.edits[player].items():
+                w = self.weekIndex[week]
+                counts[w] = newCounts
+                present[w] = True
+        return counts, present
+
+    def weekView(self, week):
+        """Return the (player x activity) counts and the player presence flags for a week.
+        These are views on the base store unless an edit touches the week.
+        """
+        counts, present = self.baseWeek(week)
+        week = self.weeks[self.weekIndex[week]]
+        edited = [(player, weeks[week]) for player, weeks in self.edits.items() if week in weeks]
+        if edited:
+            counts, present = counts.copy(), present.copy()
+            for player, newCounts in edited:
+                counts[self.playerIndex[player]] = newCounts
+                present[self.playerIndex[player]] = True
+        return counts, present
+
+    def totalView(self):
+        """Return the (player*week x activity) counts and presence flags for the whole period.
+        Without edits these are views on the base store; otherwise they are merged into new arrays.
+        """
+        if not self.edits:
+            return self.base.totalView()
+        views = [self.playerView(player) for player in self.players]
+        counts = np.stack([counts for counts, present in views])
+        present = np.stack([present for counts, present in views])
+        return counts.reshape(-1, counts.shape[2]), present.reshape(-1)
+
+    def editDeltas(self):
+        """Yield (player, week, old counts, new counts, old presence) for every edit, compared with the base store.
+        """
+        for player, weeks in self.edits.items():
+            p = self.playerIndex[player]
+            for week, newCounts in weeks.items():
+                if week in self.base.weekIndex:
+                    w = self.base.weekIndex[week]
+                    yield player, week, self.base.counts[p, w], newCounts, self.base.present[p, w]
+                else:
+                    yield player, week, np.zeros_like(newCounts), newCounts, False
+
+    def activityMean(self, week=None):
+        """Return the mean number of times each activity was executed, for the whole period or for a single week.
+        Only weeks with data are counted.
+        """
+        if week is not None:
+            counts, present = self.weekView(week)
+            return counts.sum(axis=0, dtype=np.int64) / present.sum()
+        activitySum = self.base.playerTotals().sum(axis=0)
+        presentCount = self.base.present.sum()
+        for player, week, oldCounts, newCounts, oldPresent in self.editDeltas():
+            activitySum = activitySum + newCounts.astype(np.int64) - oldCounts
+            presentCount += not oldPresent
+        return activitySum / presentCount
+
+    def playerTotals(self):
+        """Return the (player x activity) sums of every player's counts over the whole period.
+        """
+        if not self.edits:
+            return self.base.playerTotals()
+        totals = self.base.playerTotals().copy()
+        for player, week, oldCounts, newCounts, oldPresent in self.editDeltas():
+            totals[self.playerIndex[player]] += newCounts.astype(np.int64) - oldCounts
+        return totals
+
+    def playerFrame(self, player):
+        """Return a player's activities as a dataframe in the archive .csv layout.
+        """
+        counts, present = self.playerView(player)
+        return pd.DataFrame(counts[present], index=self.weeks[present],
+                            columns=np.arange(0, counts.shape[1]).astype('str'))
+
+    def setWeek(self, player, week, newCounts):
+        """Set a player's activity counts for a week, adding the week to the session calendar if needed.
+        Return the previous counts for that week (zeros if the player had no data).
+        """
+        return self.setWeeks([player], week, [newCounts])[0]
+
+    def setWeeks(self, players, week, newCounts):
+        """Set the activity counts of several players for the same week at once, with newCounts holding one row per
+        player, adding the week to the session calendar if needed.
+        Return the previous (player x activity) counts for that week (zeros for players without data).
+        """
+        if week in self.weekIndex:
+            counts, present = self.weekView(week)
+            oldCounts = counts[[self.playerIndex[player] for player in players]].astype(np.int64)
+        else:
+            oldCounts = np.zeros((len(players), len(self.activityIndex)), dtype=np.int64)
+        newCounts = np.asarray(newCounts, dtype=self.base.counts.dtype)
+        for player, playerCounts in zip(players, newCounts):
+            self.edits.setdefault(player, {})[week] = playerCounts
+        if week not in self.weekIndex:
+            self.indexWeeks()
+        return oldCounts
+
+
+#
+# FUNCTIONS
+@diagnostics.timed
+def open_zip(uploaded_zip):
+    """Open the uploaded zip file and load every player's file (.csv or .npz) into a single ActivityStore.
+    uploaded_zip is a file object or the path to the zip file.
+    Player files are checked against the activities of atividades.csv, and stored in the smallest integer dtype that
+    fits every count. A ValueError naming the file is raised for a player file that does not match the schema.
+    membros.csv is kept in the store as the member info and the archive bytes as its archive.
+    """
+    if isinstance(uploaded_zip, (str, os.PathLike)):
+        with open(uploaded_zip, 'rb') as archive:
+            uploaded_zip = io.BytesIO(archive.read())
+    activityCount = len(referenceTables().activities)
+    with zipfile.ZipFile(uploaded_zip) as z:
+        members = pd.read_csv(z.open(archiveformat.MEMBERS_FILE), index_col=0)
+        filenames = [filename for filename in z.namelist() if filename != archiveformat.MEMBERS_FILE]
+        playerData = {archiveformat.playerName(filename): archiveformat.readPlayer(z, filename, activityCount)
+                      for filename in filenames}
+    players = sorted(playerData)
+    weeks = np.array(sorted(set().union(*(playerData[player][0] for player in players))), dtype='U10')
+    dtype = max([np.dtype(archiveformat.ACTIVITY_DTYPE)] + [playerData[player][1].dtype for player in players],
+                key=lambda dtype: dtype.itemsize)
+    counts = np.zeros((len(players), len(weeks), activityCount), dtype=dtype)
+    present = np.zeros((len(players), len(weeks)), dtype=bool)
+    for p, player in enumerate(players):
+        playerWeeks, playerCounts = playerData[player]
+        positions = np.searchsorted(weeks, playerWeeks)
+        counts[p, positions] = playerCounts
+        present[p, positions] = True
+    return ActivityStore(players, weeks, counts, present, members, uploaded_zip.getvalue())
+
+def getMemberInfo(activityStore):
+    """Return a dataframe with member's name and function
+    """
+    memberInfo = activityStore.members.copy()
+    return memberInfo
+
+def getPlayerNames(activityStore):
+    """Return a list with sorted player names from the activity store
+    """
+    playerList = activityStore.players[:]
+    return playerList
+
+def activityToPointsMapper(activityStore, selectedPlayer):
+    """Return a dataframe with points mapped from activities realized by player
+    """
+    mappedPoints = activityStore.playerFrame(selectedPlayer) * referenceTables().activityPoints
+    return mappedPoints
+
+def getTotalXP(mappedPoints):
+    """Return total XP for a player from the mappedpoints as a single integer
+    """
+    totalXP = mappedPoints.sum().sum()
+    return totalXP
+
+@diagnostics.timed
+def getBatchXP(activityStore, players):
+    """Return an array with the total XP of each player in players.
+    Activity counts are summed per player over the store and scored with one matrix product against the activity points.
+    """
+    positions = [activityStore.playerIndex[player] for player in players]
+    playerCounts = activityStore.playerTotals()[positions]
+    totalXP = playerCounts @ referenceTables().activityPoints
+    return totalXP
+
+def getLevel(totalXP):
+    """Return level for a player (or an array of players) based on the total XP
+    """
+    tables = referenceTables()
+    position = np.searchsorted(tables.levelXP, totalXP, side='right') - 1
+    level = tables.levelNumber[position]
+    return level
+
+def getNextLevelXP(totalXP, level):
+    """Return remaining XP for next level. NaN is returned for players already at the last level.
+    """
+    tables = referenceTables()
+    position = np.searchsorted(tables.levelNumber, level, side='right')
+    nextXP = np.append(tables.levelXP, np.nan)[position]
+    diffXP = nextXP - totalXP
+    return diffXP
+
+def getRanking(level):
+    """Return ranking for a player (or an array of players) based on his level
+    """
+    tables = referenceTables()
+    rank = tables.elementName[np.searchsorted(tables.elementM, level)]
+    return rank
+
+def scoreXP(totalXP):
+    """Return level, ranking and remaining XP for next level from an array of total XP.
+    """
+    totalXP = np.asarray(totalXP)
+    level = getLevel(totalXP)
+    rank = getRanking(level)
+    diffXP = getNextLevelXP(totalXP, level)
+    if not np.isnan(diffXP).any():
+        diffXP = diffXP.astype(np.int64)
+    return level, rank, diffXP
+
+@diagnostics.timed
+def summaryTable(activityStore, oldsummary=None, kind='first_run'):
+    """Return summary table with all members name, function, XP, level and ranking.
+    kind='first_run' gets the member info from the activity store. Otherwise, it updates the summary from the existing
+    one, recomputing every member from the store.
+    """
+    if kind=='first_run':
+        memberInfo = getMemberInfo(activityStore)
+    elif kind=='update':
+        memberInfo = oldsummary
+    totalXP = getBatchXP(activityStore, list(memberInfo['Nome']))
+    level, rank, diffXP = scoreXP(totalXP)
+    memberInfo['XP'] = totalXP
+    memberInfo['Level'] = level
+    memberInfo['Ranking'] = rank
+    memberInfo['XP para próximo level'] = diffXP
+    memberInfo.sort_values(by='Level', inplace=True, ascending=False)   
+    return memberInfo
+
+@diagnostics.timed
+def updateSummary(summary, selectedPlayer, deltaXP):
+    """Apply an XP delta to a single member of the summary table, in place.
+    Only the selected player's XP, level, ranking and XP to next level are recomputed, and the table is only
+    re-sorted when the player's level changes.
+    """
+    return updateSummaryBatch(summary, [selectedPlayer], [deltaXP])
+
+@diagnostics.timed
+def updateSummaryBatch(summary, players, deltaXP):
+    """Apply XP deltas to several members of the summary table at once, in place.
+    The members' XP, levels, rankings and XP to next level are rescored together, and the table is re-sorted once
+    if any of their levels changed. Players that are not members (their file has no row in membros.csv) are not in
+    the table and are skipped.
+    """
+    positions = pd.Index(summary['Nome']).get_indexer(players)
+    members = positions >= 0
+    rows = summary.index[positions[members]]
+    totalXP = summary.loc[rows, 'XP'].to_numpy() + np.asarray(deltaXP, dtype=np.int64).reshape(-1)[members]
+    level, rank, diffXP = scoreXP(totalXP)
+    levelChanged = (level != summary.loc[rows, 'Level'].to_numpy()).any()
+    if np.isnan(diffXP).any() and summary['XP para próximo level'].dtype.kind == 'i':
+        summary['XP para próximo level'] = summary['XP para próximo level'].astype('float64')
+    summary.loc[rows, 'XP'] = totalXP
+    summary.loc[rows, 'Level'] = level
+    summary.loc[rows, 'Ranking'] = rank
+    summary.loc[rows, 'XP para próximo level'] = diffXP
+    if levelChanged:
+        summary.sort_values(by='Level', inplace=True, ascending=False, kind='mergesort')
+    return summary
+
+@diagnostics.timed
+def updatePlayerActivity(activityStore, selectedPlayer, playerActivitySelector, date, kind='update'):
+    """Update the player activities with a new activities row and record it in the change journal.
+    If the player already has activities for the date, that week is replaced.
+    kind='describe' is used to print the new activities so user can confirm changes.
+    kind='update' updates the (session) activity store and its journal and returns the player's XP delta.
+    The .zip file itself is only rewritten when the journal is materialised.
+    """
+    week = date.strftime('%Y-%m-%d')
+    newActivities = pd.DataFrame(playerActivitySelector, index=[week])
+    if kind=='describe':
+        return newActivities.T
+    newActivities.columns = np.arange(0,10).astype('str')
+    newCounts = newActivities.to_numpy(dtype=np.int64)[0]
+    with activityStore.journal.lock:
+        oldCounts = activityStore.setWeek(selectedPlayer, week, newCounts)
+        activityStore.journal.record(selectedPlayer, week, newCounts)
+    deltaXP = int((newCounts - oldCounts) @ referenceTables().activityPoints)
+    return deltaXP
+
+def getExistingWeek(activityStore, players, date):
+    """Return the activities the players already have for the date, one row per player with data for it.
+    Saving activities for the date again replaces these rows instead of adding to them.
+    """
+    week = date.strftime('%Y-%m-%d')
+    columns = referenceTables().activities['Atividades'].array
+    if week not in activityStore.weekIndex:
+        return pd.DataFrame(np.zeros((0, len(columns)), dtype=np.int64), columns=columns)
+    counts, present = activityStore.weekView(week)
+    rows = [activityStore.playerIndex[player] for player in players]
+    hasData = present[rows]
+    return pd.DataFrame(counts[rows][hasData].astype(np.int64), columns=columns,
+                        index=[player for player, hasWeek in zip(players, hasData) if hasWeek])
+
+def weekTemplate(activityStore):
+    """Return an empty week table for the bulk import: a Nome column with every member and a zero column per activity.
+    """
+    template = pd.DataFrame(0, index=range(len(activityStore.members)),
+                            columns=['Nome'] + list(referenceTables().activities['Atividades']))
+    template['Nome'] = activityStore.members['Nome'].to_numpy()
+    return template
+
+def readWeekTable(csvFile):
+    """Read a week table for the bulk import from a .csv file object or path.
+    """
+    weekTable = pd.read_csv(csvFile, dtype={'Nome': str}, skipinitialspace=True)
+    weekTable.columns = weekTable.columns.str.strip()
+    return weekTable
+
+@diagnostics.timed
+def validateWeekTable(activityStore, weekTable):
+    """Validate every row of a week table against the activities and the member list in one pass.
+    weekTable has a Nome column and one column per activity in activities['Atividades'], with counts from 0 to 100.
+    Return the players, their (player x activity) counts and a list of error messages; the table can only be
+    imported if the list is empty.
+    """
+    activityNames = list(referenceTables().activities['Atividades'])
+    columns = list(weekTable.columns)
+    errors = []
+    if 'Nome' not in columns:
+        errors.append('A tabela não tem a coluna Nome.')
+    missing = [activity for activity in activityNames if activity not in columns]
+    if missing:
+        errors.append('Faltam as colunas de atividades: {}.'.format(', '.join(missing)))
+    unknown = [column for column in columns if column != 'Nome' and column not in activityNames]
+    if unknown:
+        errors.append('Colunas que não são atividades: {}.'.format(', '.join(map(str, unknown))))
+    if errors:
+        return [], np.zeros((0, len(activityNames)), dtype=np.int64), errors
+    if weekTable.empty:
+        errors.append('A tabela não tem jogadores.')
+    names = weekTable['Nome'].fillna('').str.strip()
+    isMember = names.isin(list(activityStore.members['Nome']))
+    notMembers = sorted(set(names[~isMember]))
+    if notMembers:
+        errors.append('Jogadores que não são membros: {}.'.format(', '.join(repr(name) for name in notMembers)))
+    withoutFile = sorted(set(names[isMember & ~names.isin(list(activityStore.playerIndex))]))
+    if withoutFile:
+        errors.append('Membros sem arquivo no .zip: {}.'.format(', '.join(withoutFile)))
+    duplicated = sorted(set(names[names.duplicated()]))
+    if duplicated:
+        errors.append('Jogadores repetidos: {}.'.format(', '.join(duplicated)))
+    values = weekTable[activityNames].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    invalid = np.isnan(values) | (values != np.round(values)) | (values < 0) | (values > 100)
+    for row, column in zip(*np.nonzero(invalid)):
+        errors.append('Valor inválido para {} em {}: "{}" (use inteiros de 0 a 100).'.format(
+            names.iloc[row] or 'linha {}'.format(row+1), activityNames[column], weekTable[activityNames[column]].iloc[row]))
+    if errors:
+        return [], np.zeros((0, len(activityNames)), dtype=np.int64), errors
+    return list(names), values.astype(np.int64), errors
+
+@diagnostics.timed
+def importWeekActivity(activityStore, players, newCounts, date):
+    """Set a validated week table for the date in the session activity store and record it in the change journal
+    as a single edit, replacing the week of players that already have data for it.
+    Return the players and their XP deltas, to update the summary table with updateSummaryBatch.
+    """
+    week = date.strftime('%Y-%m-%d')
+    with activityStore.journal.lock:
+        oldCounts = activityStore.setWeeks(players, week, newCounts)
+        activityStore.journal.recordWeek(players, week, newCounts)
+    deltaXP = (np.asarray(newCounts, dtype=np.int64) - oldCounts) @ referenceTables().activityPoints
+    return players, deltaXP
+
+@diagnostics.timed
+def getAvailableDates(activityStore, selectedPlayer=None, kind='all'):
+    """Get all available dates from the players data, in chronological order, as '%d/%m/%y' labels.
+    kind='all' return available dates for all players
+    kind='individual' return available dates for selected player
+    """
+    if kind=='all':
+        availableDates = activityStore.availableWeeks()
+    elif kind=='individual':
+        availableDates = activityStore.availableWeeks(selectedPlayer)
+    return availableDates
+
+@diagnostics.timed
+def getTotalActivity(activityStore):
+    """Get week activities for all players for the whole period.
+    """
+    counts, present = activityStore.totalView()
+    weeks = np.tile(activityStore.weeks, len(activityStore.players))
+    totalActivity = pd.DataFrame(counts[present], index=weeks[present],
+                                 columns=referenceTables().activities['Atividades'].array)
+    return totalActivity
+    
+@diagnostics.timed
+def getWeekActivity(activityStore, date, selectedPlayer=None, kind='all'):
+    """Get weekly player activities for the selected date, given either as a '%Y-%m-%d' key or a '%d/%m/%y' label.
+    kind='all' returns all players' activities along with a list of players that do not have the information for that date and a warningStatus (bool) that triggers the app's warning about these players.
+    kind='individual' returns the selectedPlayer week activity for the date.
+    A KeyError is raised if there is no data for the date.
+    """
+    week = date
+    activityNames = referenceTables().activities['Atividades'].array
+    if kind=='all':
+        counts, present = activityStore.weekView(week)
+        players = np.asarray(getPlayerNames(activityStore))
+        weekActivity = pd.DataFrame(counts[present], index=players[present], columns=activityNames)
+        playersWithoutData = activityStore.playersWithoutData(week)
+        warningStatus = (len(playersWithoutData) != 0)
+        return weekActivity, playersWithoutData, warningStatus
+    elif kind=='individual':
+        counts, present = activityStore.playerView(selectedPlayer)
+        w = activityStore.weekIndex[week]
+        if not present[w]:
+            raise KeyError(week)
+        return pd.Series(counts[w], index=activityNames, name=week)
+
+@diagnostics.timed
+def getMean(weekActivity):
+    """Return a pandas series with the mean number of times each activity was executed.
+    """
+    mean = weekActivity.mean()
+    return mean
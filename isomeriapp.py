@@ -1,254 +1,243 @@
 import streamlit as st
-import numpy as np
 import pandas as pd
-import altair as alt
 import datetime
-import zipfile
-import base64
+import io
+import aggregates
+import computegraph
+import datacache
+import diagnostics
+import downloads
+from charts import barplot, XPlineplot, leaderboardplot, chartSpec
+import isomeriacore
+import sessions
+from isomeriacore import (open_zip, getPlayerNames, summaryTable, updateSummaryBatch, updatePlayerActivity,
+                          getExistingWeek, getAvailableDates, getWeekActivity, readWeekTable, validateWeekTable,
+                          importWeekActivity)
+
+diagnostics.startRun(sessions.sessionId())
 
 #
 # READ FILES
-activities = pd.read_csv('atividades.csv', index_col=0)
-progression = pd.read_csv('progressao.csv')
-element_list = pd.read_csv('elementlist.csv', names=['M', 'element_initial', 'element'])
+activities = isomeriacore.activities
 
 #
 # FUNCTIONS
-@st.cache(allow_output_mutation=True)
-def open_zip(uploaded_zip):
-    """Open the uploaded zip file, convert it's csv files to dataframes and stores them in a dictionnary where
-    keys are the player name and elements are the dataframes.
-    """
-    z = zipfile.ZipFile(uploaded_zip)
-    playerData={csv[:-4]: pd.read_csv(z.open(csv), index_col=0) for csv in z.namelist()}
-    z.close()
-    return playerData
-
-def getMemberInfo():
-    """Return a dataframe with member's name and function
-    """
-    z = zipfile.ZipFile(uploaded_zip)
-    memberInfo = pd.read_csv(z.open('membros.csv'), index_col=0)
-    z.close()
-    return memberInfo
-
-def getPlayerNames(playerData):
-    """Return a list with sorted player names from the playerData dictionary
-    """
-    playerList = list(playerData.keys())[:]
-    playerList.sort()
-    playerList.remove('membros')
-    return playerList
-
-def activityToPointsMapper(selectedPlayer):
-    """Return a dataframe with points mapped from activities realized by player
-    """
-    mappedPoints = playerData[selectedPlayer].apply(lambda activity: activity.array*activities['Pontos'], axis=1)
-    return mappedPoints
-
-def getTotalXP(mappedPoints):
-    """Return total XP for a player from the mappedpoints as a single integer
-    """
-    totalXP = mappedPoints.sum().sum()
-    return totalXP
-
-def getLevel(totalXP):
-    """Return level for a player based on the total XP
+def playerInfo(selectedPlayer):
+    """Return row with player Name, Function, XP, Ranking and XP to next level
     """
-    level = progression[progression['xp'] <= totalXP]['nivel'].max()
-    return level
+    selectedPlayerInfo = graph.get('summaryByName').loc[[selectedPlayer]]
+    return selectedPlayerInfo
 
-def getNextLevelXP(xp_level):
-    """Return remaining XP for next level
+def archiveLoaded():
+    """Return whether an archive was uploaded and could be read, showing why it could not in the sidebar.
     """
-    nextXP = progression[progression['nivel'] > xp_level[1]]['xp'].min()
-    diffXP = nextXP - xp_level[0]
-    return diffXP
+    if uploaded_zip is None:
+        return False
+    try:
+        graph.get('activityStore')
+    except ValueError as error:
+        st.sidebar.error('O arquivo .zip não pôde ser lido: {}'.format(error))
+        return False
+    return True
 
-def getRanking(level):
-    """Return ranking for a player based on his level
-    """
-    rank = element_list[element_list['M'] == level]['element'].array[0]
-    return rank
-
-@st.cache(allow_output_mutation=True)
-def summaryTable(oldsummary=None, kind='first_run'):
-    """Return summary table with all members name, function, XP, level and ranking.
-    kind='first_run' gets the member info from the zip file. Otherwise, it updates the summary from the existing one.
-    This is used to set new  XP, level and ranking from modified data in the 'Editar' page
+def commitChanges(applyChanges, date):
+    """Apply changes for the week of date to the session's activity store and update the session's summary table
+    and aggregate cube once. applyChanges() returns the changed players and their XP deltas.
+    The summary and cube of the unedited archive are shared by all sessions, so they are copied on the session's
+    first edit.
     """
-    if kind=='first_run':
-        memberInfo = getMemberInfo()
-    elif kind=='update':
-        memberInfo = oldsummary
-    memberInfo['XP'] = memberInfo['Nome'].map(lambda player: getTotalXP(activityToPointsMapper(player)))
-    memberInfo['Level'] = memberInfo['XP'].map(lambda xp: getLevel(xp))
-    memberInfo['Ranking'] = memberInfo['Level'].map(lambda level: getRanking(level))
-    memberInfo['XP para próximo level'] = memberInfo[['XP','Level']].apply(getNextLevelXP, axis=1)
-    memberInfo.sort_values(by='Level', inplace=True, ascending=False)   
-    global summary
-    summary = memberInfo
-    return summary
+    sharedSummary = (graph.get('activityStore').journal.version == 0)
+    summary, cube = graph.get('summary'), graph.get('cube')
+    if not sharedSummary:
+        graph.discard('summary')
+        graph.discard('cube')
+    players, deltaXP = applyChanges()
+    if sharedSummary:
+        summary = summary.copy()
+        cube = cube.copy()
+    updateSummaryBatch(summary, players, deltaXP)
+    cube = cube.update(graph.get('activityStore'), players, date.strftime('%Y-%m-%d'))
+    graph.put('summary', summary)
+    graph.put('cube', cube)
 
-def playerInfo(selectedPlayer):
-    """Return row with player Name, Function, XP, Ranking and XP to next level
+def commitPlayerActivity(selectedPlayer, playerActivitySelector, date):
+    """Record a player's new activities in the session and update the session's summary table.
     """
-    selectedPlayerInfo = summary[summary['Nome'] == selectedPlayer].set_index('Nome')
-    return selectedPlayerInfo
+    activityStore = graph.get('activityStore')
+    commitChanges(lambda: ([selectedPlayer],
+                           [updatePlayerActivity(activityStore, selectedPlayer, playerActivitySelector, date)]), date)
 
-def updatePlayerActivity(selectedPlayer, playerActivitySelector, date, kind='update'):
-    """Update the player activity .csv table with a new activities row and alter the .zip file.
-    kind='describe' is used to print the new activities so user can confirm changes.
-    kind='update' updates the .csv and .zip files.
+def editWeek():
+    """Bulk edit: import a whole week, one row per player, from an uploaded .csv or from a table typed in the page,
+    validate it at once and commit every row in a single edit.
     """
-    newActivities = pd.DataFrame(playerActivitySelector, index=[date.strftime('%Y-%m-%d')])
-    if kind=='describe':
-        return newActivities.T
-    newActivities.columns = np.arange(0,10).astype('str')
-    playerData[selectedPlayer] = pd.concat([playerData[selectedPlayer], newActivities])
-    with zipfile.ZipFile(uploaded_zip, 'w') as csv_zip:
-        memberInfo = getMemberInfo()
-        for player in playerList:
-            csv_zip.writestr(player+'.csv', playerData[player].to_csv())
-        csv_zip.writestr('membros.csv', memberInfo.to_csv())
+    activityStore = graph.get('activityStore')
+    date = st.date_input('Qual a data da semana?', value=datetime.date.today())
+    st.markdown('Envie um arquivo .csv com a coluna **Nome** e uma coluna por atividade, ou edite a tabela abaixo '
+                '(uma linha por jogador, valores separados por vírgula):')
+    uploaded_week = st.file_uploader('Tabela da semana (.csv):', type='csv')
+    if uploaded_week is not None:
+        uploaded_week.seek(0)
+        weekCsv = uploaded_week
+    else:
+        weekCsv = io.StringIO(st.text_area('Tabela da semana:', graph.get('weekTemplate')))
+    try:
+        weekTable = readWeekTable(weekCsv)
+    except (ValueError, pd.errors.ParserError) as error:
+        st.error('Não foi possível ler a tabela: {}'.format(error))
+        return
+    players, newCounts, errors = validateWeekTable(activityStore, weekTable)
+    if errors:
+        st.error('A tabela tem {} problema(s):'.format(len(errors)))
+        st.markdown('\n'.join('* '+error for error in errors))
+        return
+    existing = graph.get('existingWeek', tuple(players), date)
+    if len(existing):
+        st.warning('{} jogador(es) já têm atividades na data de {}. Elas serão substituídas pelas da tabela, e não '
+                   'somadas a elas.'.format(len(existing), date.strftime('%d/%m/%Y')))
+        st.subheader('Atividades atuais:')
+        st.dataframe(existing)
+        st.subheader('Atividades que serão gravadas:')
+    else:
+        st.subheader('Atividades a serem adicionadas:')
+    st.dataframe(pd.DataFrame(newCounts, index=players, columns=activities['Atividades'].array))
+    st.write('Confirma e envia mudanças para {} jogadores na data de {}?'.format(len(players), date.strftime('%d/%m/%Y')))
+    if st.button('SIM, MODIFIQUE TODOS!'):
+        commitChanges(lambda: importWeekActivity(activityStore, players, newCounts, date), date)
+        st.success('MODIFICADO COM SUCESSO! FAÇA DOWNLOAD OU CONTINUE A EDITAR!')
+        summaryByName = graph.get('summaryByName')
+        st.table(summaryByName[summaryByName.index.isin(players)])
+    st.markdown(get_zip_download_link(datetime.date.today()), unsafe_allow_html=True)
 
 def get_zip_download_link(date):
     """Generates a link allowing the data in a given ZIP file to be downloaded
-    in:  cached zip file
+    in:  cached zip file, with the pending journal entries applied when the link is followed
     out: href string
     """
-    b64 = base64.b64encode(uploaded_zip.getvalue()).decode() # bytes conversions necessary here
-    ziphref = f'<strong><a href="data:file/zip;base64,{b64}" download="'+date.strftime('%d/%m/%Y')+'-weeklyData.zip">Download do arquivo .zip</a></strong>'
+    activityStore = graph.get('activityStore')
+    url = downloads.registerDownload('archive', graph.key('dataVersion'),
+                                     date.strftime('%d-%m-%Y')+'-weeklyData.zip', 'application/zip',
+                                     lambda: activityStore.journal.materialise(activityStore))
+    ziphref = f'<strong><a href="{url}" download="'+date.strftime('%d-%m-%Y')+'-weeklyData.zip">Download do arquivo .zip</a></strong>'
     return ziphref
 
 def get_csv_download_link(df):
     """Generates a link allowing the data in a given panda dataframe to be downloaded
-    in:  dataframe
+    in:  dataframe, converted to .csv when the link is followed
     out: href string
     """
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()  # some strings <-> bytes conversions necessary here
-    href = f'<strong><a href="data:file/csv;base64,{b64}" download="summary.csv">Download do Resumo</a></strong>'
+    url = downloads.registerDownload('summary', graph.key('dataVersion'),
+                                     'summary.csv', 'text/csv', lambda: df.to_csv(index=False).encode())
+    href = f'<strong><a href="{url}" download="summary.csv">Download do Resumo</a></strong>'
     return href
 
-def getAvailableDates(selectedPlayer=None, kind='all'):
-    """Get all available dates from the players data.
-    kind='all' return available dates for all players
-    kind='individual' return available dates for selected player
+def showChart(key, build):
+    """Write the chart built by build(). Its Vega-Lite spec is memoised by key (chart kind, player, week...) and the
+    data version, so an unchanged chart is neither rebuilt nor re-serialised on a rerun, and sends the same message.
     """
-    alldates=[]
-    if kind=='all':
-        players = getPlayerNames(playerData)
-    elif kind=='individual':
-        players = [selectedPlayer]
-    for player in players:
-        for dates in playerData[player].index:
-            alldates.append(pd.to_datetime(dates).strftime('%d/%m/%y'))    
-    availableDates = pd.Series(alldates).unique()
-    return availableDates
-
-def getTotalActivity():
-    """Get week activities for all players for the whole period.
+    spec = datacache.cache.get(('chart',) + key + (graph.key('dataVersion'),), lambda: chartSpec(build()))
+    st.vega_lite_chart(spec=dict(spec))
+
+def showDiagnostics():
+    """Finish recording the rerun and, if asked for, show its timings, row counts and cache hits in the sidebar.
     """
-    players = getPlayerNames(playerData)
-    totalActivity = pd.DataFrame()
-    for player in players:
-        totalActivity = totalActivity.append(playerData[player])
-    totalActivity = totalActivity.astype('int8')
-    totalActivity.columns = activities['Atividades'].array
-    return totalActivity
-    
-def getWeekActivity(date, selectedPlayer=None, kind='all'):
-    """Get weekly player activities for the selected date.
-    kind='all' returns all players' activities along with a list of players that do not have the information for that date and a warningStatus (bool) that triggers the app's warning about these players.
-    kind='individual' returns the selectedPlayer week activity for the date.
+    run = diagnostics.endRun()
+    if run is None or not st.sidebar.checkbox('Mostrar diagnóstico de desempenho'):
+        return
+    st.sidebar.markdown('**Execução:** {:.0f} ms - cache: {} acertos, {} faltas, {:.1f} MB'.format(
+        run['seconds']*1000, run['cacheHits'], run['cacheMisses'], run['cacheBytes']/1024**2))
+    records = pd.DataFrame(run['records'], columns=['name', 'depth', 'seconds', 'rows', 'cacheHits', 'cacheMisses'])
+    table = pd.DataFrame({'Etapa': ['. '*depth + name for name, depth in zip(records['name'], records['depth'])],
+                          'ms': (records['seconds']*1000).round(1),
+                          'Linhas': records['rows'].map(lambda rows: '' if pd.isna(rows) else int(rows)),
+                          'Cache': records['cacheHits'].astype(str)+'/'+records['cacheMisses'].astype(str)})
+    st.sidebar.table(table.set_index('Etapa'))
+    url = downloads.registerDownload('diagnostics', (run['started'], run['seconds']),
+                                     'diagnostics.json', 'application/json',
+                                     lambda: diagnostics.exportRuns(run['session']).encode())
+    st.sidebar.markdown(f'<a href="{url}" download="diagnostics.json">Download do diagnóstico</a>',
+                        unsafe_allow_html=True)
+
+#
+# DATA GRAPH
+# Values derived from the uploaded archive are only computed when a page pulls them with graph.get, and only
+# recomputed when the archive or the session's data version changes.
+graph = computegraph.Graph(datacache.cache)
+
+def versionKey():
+    """Return the uploaded archive and the session's data version. Sessions without edits share the same version,
+    a session with edits gets versions of its own.
+    """
+    version = graph.get('activityStore').journal.version
+    return (archiveKey, sessions.sessionId() if version else None, version)
+
+@graph.node(key=lambda: archiveKey)
+def baseStore():
+    """Activity store of the uploaded archive, shared by every session.
+    """
+    return open_zip(uploaded_zip)
+
+@graph.node(key=lambda: archiveKey, cached=False)
+def activityStore():
+    """The session's store, holding its edits on top of the shared one.
+    """
+    return sessions.getSessionState(archiveKey, lambda: isomeriacore.SessionStore(graph.get('baseStore')))
+
+@graph.node(key=versionKey, cached=False)
+def dataVersion():
+    return versionKey()
+
+@graph.node('activityStore', cached=False)
+def playerList(activityStore):
+    return getPlayerNames(activityStore)
+
+@graph.node('activityStore', 'dataVersion')
+def summary(activityStore, dataVersion):
+    return summaryTable(activityStore)
+
+@graph.node('summary')
+def summaryByName(summary):
+    return summary.set_index('Nome')
+
+@graph.node('activityStore', 'dataVersion')
+def cube(activityStore, dataVersion):
+    return aggregates.buildCube(activityStore)
+
+@graph.node('cube', cached=False)
+def availableDates(cube):
+    return cube.availableWeeks()
+
+@graph.node('activityStore', 'dataVersion')
+def playerDates(activityStore, dataVersion, selectedPlayer):
+    return getAvailableDates(activityStore, selectedPlayer, kind='individual')
+
+@graph.node('cube')
+def totalMean(cube):
+    """Mean number of times each activity was executed in the whole period.
     """
-    if kind=='all':
-        players = getPlayerNames(playerData)
-    elif kind=='individual':
-        players = [selectedPlayer]
-    week = date
-    weekActivity = pd.DataFrame()
-    playersWithoutData = []
-    for player in players:
-        try: # necessary if not all players have data for the date recorded.
-            weekActivity = weekActivity.append(playerData[player].loc[week, :])
-        except:
-            playersWithoutData.append(player)
-    weekActivity = weekActivity.astype('int8')
-    warningStatus = (len(playersWithoutData) != 0)
-    weekActivity.columns = activities['Atividades'].array
-    if kind=='all':
-        return weekActivity, playersWithoutData, warningStatus
-    elif kind=='individual':
-        return weekActivity.iloc[0]
-
-def getMean(weekActivity):
-    """Return a pandas series with the mean number of times each activity was executed.
+    return pd.Series(cube.activityMean(), index=activities['Atividades'].array)
+
+@graph.node('cube')
+def weekMean(cube, date):
+    """Mean number of times each activity was executed in the week of date.
     """
-    mean = weekActivity.mean()
-    return mean
+    return pd.Series(cube.activityMean(date), index=activities['Atividades'].array)
+
+@graph.node('activityStore')
+def weekTemplate(activityStore):
+    return isomeriacore.weekTemplate(activityStore).to_csv(index=False)
 
-def barplot(df, date=None, selectedPlayer=None, kind='total'):
-    """Create activities barplot.
-    kind='total' returns a barplot with x-label indicating the average is for the whole period
-    kind='weekly' returns a barplot with x-label indicating the average is for a specific week
+@graph.node('activityStore', 'dataVersion', cached=False)
+def activityPreview(activityStore, dataVersion, selectedPlayer, activityCounts, date):
+    """New activities of a player, as shown for confirmation before they are recorded.
     """
-    df = df.reset_index()
-    df['XP da atividade'] = activities['Pontos']
-    df.columns = ['Atividades', ' ', 'XP da atividade']
-    if kind=='total':        
-        title = 'Número médio de atividades realizadas em todo o período'
-    elif kind=='weekly':
-        title = 'Número médio de atividades realizadas na semana de {}'.format(
-            pd.to_datetime(date, format='%d/%m/%y').strftime('%d/%m'))
-        if selectedPlayer is not None:
-            title = 'Atividades realizadas na semana de {} - {}'.format(
-            pd.to_datetime(date, format='%d/%m/%y').strftime('%d/%m'), selectedPlayer)
-    bars = alt.Chart(df, title=title).mark_bar(
-        cornerRadiusTopLeft=3,
-        cornerRadiusTopRight=3
-    ).encode(
-        x=alt.X(df.columns[1]+':Q', axis=alt.Axis(tickMinStep=1)),
-        y=alt.Y(df.columns[0]+':N', sort='color'),
-        color=alt.Color(df.columns[2]+':O', scale=alt.Scale(scheme="plasma"))
-    )
-    text = bars.mark_text(
-        align='left',
-        baseline='middle',
-        dx=3  # Nudges text to right so it doesn't appear on top of the bar
-    ).encode(
-        text=alt.Text(df.columns[1]+':Q', format='.2')
-    )
-    barplot = (bars+text).properties(width = 797, height=400)
-    return barplot
-
-def XPlineplot(selectedPlayer):
-    """Create individual player XP line plot.
+    return updatePlayerActivity(activityStore, selectedPlayer, dict(activityCounts), date, kind='describe')
+
+@graph.node('activityStore', 'dataVersion', cached=False)
+def existingWeek(activityStore, dataVersion, players, date):
+    """Activities the players already have for the date, which an edit of the date replaces.
     """
-    plotdata = activityToPointsMapper(selectedPlayer).sum(axis=1).reset_index()
-    plotdata.columns = ['semana', 'XP']
-    plotdata['semana'] = plotdata['semana'].apply(pd.to_datetime)
-    XPlineplot = alt.Chart(
-        plotdata,
-        width = 697, height=400,
-        title='XP semanal - {}'.format(selectedPlayer)
-    ).mark_area(
-        point={'color':'#744a98', 'size':70},
-        line={'color':'#744a98'},
-        color=alt.Gradient(
-            gradient='linear',
-            stops=[alt.GradientStop(color='#23ac76', offset=0),
-                   alt.GradientStop(color='#23ac7640', offset=1)],
-            x1=1.5,
-            x2=1.25,
-            y1=1,
-            y2=0.1
-        )).encode(
-        alt.X('semana:T', axis=alt.Axis(values=list(plotdata['semana'].array), format='%d/%m', grid=False)),
-        alt.Y('XP:Q')
-    )
-    return XPlineplot    
+    return getExistingWeek(activityStore, players, date)
 
 #
 # SIDEBAR
@@ -259,10 +248,8 @@ add_text = st.sidebar.markdown('### Bem vindo!')
 # Add file uploader to the sidebar:
 uploaded_zip = st.sidebar.file_uploader("Escolha sua coleção de arquivos (.zip):", type="zip")
 if uploaded_zip is not None:
-    playerData = open_zip(uploaded_zip)
-    playerList = getPlayerNames(playerData)
-    summary = summaryTable(kind='first_run')
-    
+    archiveKey = datacache.archiveHash(uploaded_zip.getvalue())
+
 # Add a selectbox to the sidebar:
 add_selectbox = st.sidebar.selectbox(
     'O que vai ser hoje?',
@@ -285,9 +272,9 @@ def main():
                    )
         st.markdown('____')
         st.header('Resumo dos jogadores')
-        if uploaded_zip is not None:
-            st.table(summary.set_index('Nome'))
-            st.markdown(get_csv_download_link(summary), unsafe_allow_html=True)
+        if archiveLoaded():
+            st.table(graph.get('summaryByName'))
+            st.markdown(get_csv_download_link(graph.get('summary')), unsafe_allow_html=True)
         else:
             st.markdown('**Oops! O arquivo .zip não foi enviado!**')      
         st.markdown('____')
@@ -296,7 +283,9 @@ def main():
                    )
         st.markdown('* Selecione **Editar** e use os controles para adicionar atividades a cada jogador. *O **recomendado** é inserir as atividades de cada participante ao fim de cada semana, **na mesma data**.*'
                    )
-        st.markdown('* Ao final da edição de atividades para cada jogador, será disponibilizado um link de download para um arquivo .zip com os dados já atualizados.* **Ao editar os dados de atividade para o último jogador, tenha certeza de fazer o download deste arquivo para utilização posterior!** *Selecione **Visualizar** para obter gráficos gerais e de cada jogador através dos dados atualizados.'
+        st.markdown('* Para lançar a semana de todos os jogadores de uma vez, selecione **Semana inteira** em **Editar** e envie um .csv com a coluna **Nome** e uma coluna por atividade, ou preencha a tabela na própria página. Todas as linhas são conferidas antes de qualquer modificação.'
+                   )
+        st.markdown('* Ao final da edição de atividades, use o link **Download do arquivo .zip** para obter um arquivo .zip com os dados já atualizados.* **Ao editar os dados de atividade para o último jogador, tenha certeza de fazer o download deste arquivo para utilização posterior!** *Selecione **Visualizar** para obter gráficos gerais e de cada jogador através dos dados atualizados.'
                    )
         st.markdown('* Também é possível salvar a tabela de resumo acima através do botão de download a qualquer instante! As modificações para cada participante são sempre refletidas nessa tabela.'
                    )
@@ -304,7 +293,7 @@ def main():
                    )
         st.markdown('* Qualquer um dos gráficos gerados pode ser baixado através de suas opções (três pontos no canto superior direito do gráfico).'
                    )
-        st.markdown('* O WebApp vai **guardar o estado das modificações feitas**, por isso, se deseja descartar modificações aperte **c** no teclado para limpar o cache e **r** para regarregar o app. Se quer enviar outro .zip, use **F5** no lugar de r.'
+        st.markdown('* O WebApp vai **guardar o estado das modificações feitas** enquanto a página estiver aberta, por isso, se deseja descartar modificações ou enviar outro .zip, recarregue a página com **F5**. As modificações feitas por outros usuários não afetam os seus dados.'
                    )
         st.markdown('* **Se observar erros**, tente limpar o cache referido anteriormente - **c** no teclado - e então recarregue o app com **F5**. Se persistir, entre em contato!'
                    )
@@ -321,10 +310,15 @@ def main():
     if add_selectbox == 'Editar':
         st.header(add_selectbox)
         st.markdown('____')
-        if uploaded_zip is not None:
+        loaded = archiveLoaded()
+        if loaded:
+            editMode = st.radio('Como deseja editar?', ('Um jogador por vez', 'Semana inteira'))
+        if loaded and editMode == 'Semana inteira':
+            editWeek()
+        elif loaded:
             selectedPlayer = st.selectbox(
                 'Os dados de que jogador serão atualizados?',
-                (playerList)
+                (graph.get('playerList'))
             )
             date = st.date_input(
                 'E qual a data?',
@@ -340,16 +334,23 @@ def main():
             st.subheader('Informação atual:')
             selectedPlayerInfo = playerInfo(selectedPlayer)
             st.table(selectedPlayerInfo)
-            st.subheader('Atividades a serem adicionadas:')
-            st.table(updatePlayerActivity(selectedPlayer, playerActivitySelector, date, kind='describe'))
+            existing = graph.get('existingWeek', (selectedPlayer,), date)
+            if len(existing):
+                st.warning('{} já tem atividades na data de {}. Elas serão substituídas pelas atividades abaixo, e não '
+                           'somadas a elas.'.format(selectedPlayer, date.strftime('%d/%m/%Y')))
+                st.subheader('Atividades atuais:')
+                st.table(existing.T)
+                st.subheader('Atividades que as substituirão:')
+            else:
+                st.subheader('Atividades a serem adicionadas:')
+            st.table(graph.get('activityPreview', selectedPlayer, tuple(playerActivitySelector.items()), date))
             st.write('Confirma e envia mudanças para {} na data de {}?'.format(selectedPlayer, date.strftime('%d/%m/%Y')))
             if st.button('SIM, MODIFIQUE!'):
                 st.success('MODIFICADO COM SUCESSO! FAÇA DOWNLOAD OU CONTINUE A EDITAR!')
-                updatePlayerActivity(selectedPlayer, playerActivitySelector, date)
-                summaryTable(summary, kind='update')
+                commitPlayerActivity(selectedPlayer, playerActivitySelector, date)
                 st.table(playerInfo(selectedPlayer))
-                ziphref = get_zip_download_link(datetime.date.today())
-                st.markdown(ziphref, unsafe_allow_html=True)
+            ziphref = get_zip_download_link(datetime.date.today())
+            st.markdown(ziphref, unsafe_allow_html=True)
         else:
             st.markdown('**Oops! O arquivo .zip não foi enviado!**')
             
@@ -357,48 +358,54 @@ def main():
     if add_selectbox == 'Visualizar':
         st.header(add_selectbox)
         st.markdown('____')
-        if uploaded_zip is not None:
+        if archiveLoaded():
             st.header('Visualização Geral')
-            availableDates = getAvailableDates(kind='all')
-            try:
-                st.subheader('Número médio de atividades realizadas no período de {} a {}'.
-                             format(availableDates[0], availableDates[-1]))
-            except:
-                st.warning('Ainda não há atividades!') 
-            totalMean = getMean(getTotalActivity())
-            st.write(barplot(totalMean, kind='total'))
-            st.subheader('Número médio de atividades realizadas por semana')            
-            barplotDate = st.selectbox('Selecione a data da semana:',
-                                       (availableDates), index=(len(availableDates)-1), key=1)
-            try:
-                weekActivity, playersWithoutData, warningStatus = getWeekActivity(
-                    date=pd.to_datetime(barplotDate, format='%d/%m/%y').strftime('%Y-%m-%d'), kind='all')
-                weekMean = getMean(weekActivity)
-                st.write(barplot(weekMean, barplotDate, kind='weekly'))
-                if warningStatus:
-                    st.write('PS.: Os jogadores a seguir não tem dados para a data de {}:'.format(barplotDate), playersWithoutData)
-            except:
-                st.warning('Ainda não há atividades!')           
+            with diagnostics.section('Visualização Geral'):
+                availableDates = graph.get('availableDates')
+                try:
+                    st.subheader('Número médio de atividades realizadas no período de {} a {}'.
+                                 format(availableDates[0], availableDates[-1]))
+                except:
+                    st.warning('Ainda não há atividades!') 
+                showChart(('total',), lambda: barplot(graph.get('totalMean'), kind='total'))
+                st.subheader('Número médio de atividades realizadas por semana')            
+                barplotDate = st.selectbox('Selecione a data da semana:',
+                                           (availableDates), index=(len(availableDates)-1), key=1)
+                try:
+                    playersWithoutData = graph.get('cube').playersWithoutData(barplotDate)
+                    showChart(('weekly', None, barplotDate),
+                              lambda: barplot(graph.get('weekMean', barplotDate), barplotDate, kind='weekly'))
+                    if playersWithoutData:
+                        st.write('PS.: Os jogadores a seguir não tem dados para a data de {}:'.format(barplotDate), playersWithoutData)
+                except:
+                    st.warning('Ainda não há atividades!')           
             st.markdown('____')
             st.header('Visualização Individual')
-            selectedPlayer = st.selectbox(
-                'Os dados de que jogador serão visualizados?',
-                (playerList)
-            )
-            individualDates = getAvailableDates(selectedPlayer, kind='individual')
-            individualBarplotDate = st.selectbox('Selecione a data da semana:',
-                                       (individualDates), index=(len(individualDates)-1), key=2)
-            st.subheader('Informação atual:')
-            selectedPlayerInfo = playerInfo(selectedPlayer)
-            st.table(selectedPlayerInfo)
-            try:
-                individualWeekActivity = getWeekActivity(
-                    date=pd.to_datetime(individualBarplotDate, format='%d/%m/%y').strftime('%Y-%m-%d'),
-                    selectedPlayer=selectedPlayer, kind='individual')
-                st.write(barplot(individualWeekActivity, individualBarplotDate, selectedPlayer, kind='weekly'))
-            except:
-                st.warning('Ainda não há atividades!')
-            st.write(XPlineplot(selectedPlayer))            
+            with diagnostics.section('Visualização Individual'):
+                selectedPlayer = st.selectbox(
+                    'Os dados de que jogador serão visualizados?',
+                    (graph.get('playerList'))
+                )
+                individualDates = graph.get('playerDates', selectedPlayer)
+                individualBarplotDate = st.selectbox('Selecione a data da semana:',
+                                           (individualDates), index=(len(individualDates)-1), key=2)
+                st.subheader('Informação atual:')
+                selectedPlayerInfo = playerInfo(selectedPlayer)
+                st.table(selectedPlayerInfo)
+                try:
+                    showChart(('weekly', selectedPlayer, individualBarplotDate), lambda: barplot(
+                        getWeekActivity(graph.get('activityStore'), date=individualBarplotDate, selectedPlayer=selectedPlayer,
+                                        kind='individual'), individualBarplotDate, selectedPlayer, kind='weekly'))
+                except:
+                    st.warning('Ainda não há atividades!')
+                showChart(('XP', selectedPlayer), lambda: XPlineplot(graph.get('cube'), selectedPlayer))
+            st.markdown('____')
+            st.header('Ranking ao longo do tempo')
+            with diagnostics.section('Ranking ao longo do tempo'):
+                memberNames = list(graph.get('summary')['Nome'])
+                leaderboardPlayers = st.multiselect('Jogadores:', memberNames, default=memberNames[:5])
+                showChart(('leaderboard', tuple(leaderboardPlayers)),
+                          lambda: leaderboardplot(graph.get('cube').leaderboardHistory(leaderboardPlayers)))
         else:
             st.markdown('**Oops! O arquivo .zip não foi enviado!**')
 
@@ -414,4 +421,6 @@ def main():
         st.markdown('* E-mail: kp.franciosi@gmail.com')
         
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    with diagnostics.section(add_selectbox):
+        main()
+    showDiagnostics()
@@ -0,0 +1,56 @@
+"""Per-session state kept across reruns of the app.
+
+Streamlit reruns the app script from the top on every interaction, so state that has to survive a rerun but belongs
+to a single browser session, such as its edits, is kept here under the session id. The state of sessions that are no
+longer connected to the server is dropped.
+"""
+import threading
+
+from streamlit.ReportThread import get_report_ctx
+from streamlit.server.Server import Server
+
+_states = {}
+_lock = threading.Lock()
+
+
+def sessionId():
+    """Return the id of the session running the current script thread.
+    """
+    ctx = get_report_ctx()
+    return ctx.session_id if ctx is not None else None
+
+
+def activeSessions():
+    """Return the ids of the sessions connected to the server, or None if no server is running.
+    """
+    try:
+        return set(Server.get_current()._session_info_by_id)
+    except RuntimeError:
+        return None
+
+
+def pruneSessions():
+    """Drop the state of sessions that are no longer connected.
+    """
+    active = activeSessions()
+    if active is None:
+        return
+    with _lock:
+        for session in list(_states):
+            if session not in active:
+                del _states[session]
+
+
+def getSessionState(key, factory):
+    """Return the current session's state for key, creating it with factory() if the session has no state yet or
+    its state belongs to another key (e.g. another uploaded archive).
+    """
+    pruneSessions()
+    session = sessionId()
+    with _lock:
+        state = _states.get(session)
+    if state is None or state[0] != key:
+        state = (key, factory())
+        with _lock:
+            _states[session] = state
+    return state[1]